@@ -0,0 +1,375 @@
+'''
+File: cache.py
+Author: Joshua Jacobs-Rebhun
+Date: January 10, 2022
+
+This file implements bounded caches on top of the chaining hashtable. Each
+cache keeps its entries in an intrusive doubly linked list threaded through
+the next and prev fields of the table's own elements, so keeping the
+eviction order costs no extra objects and every operation is O(1).
+'''
+
+import sys
+import time
+
+from hashtable import HashTable, TableElement
+
+
+'''
+Table element with the extra bookkeeping the caches need: the estimated
+size of the entry in bytes, how often it has been used, and when it expires.
+'''
+class CacheEntry(TableElement):
+
+    __slots__ = ('numBytes', 'frequency', 'expires')
+
+    def __init__(self, key, value, chainNext=None, chainPrev=None, hashCache=None, next=None, prev=None):
+        super().__init__(key, value, chainNext, chainPrev, hashCache, next, prev)
+        self.numBytes = 0
+        self.frequency = 0
+        self.expires = None
+
+
+# rough cost of the element itself, added to the size of its key and value
+ENTRY_OVERHEAD = sys.getsizeof(CacheEntry(None, None))
+
+
+# default estimate of the memory an entry holds
+def defaultSizeOf(key, value):
+    return sys.getsizeof(key) + sys.getsizeof(value) + ENTRY_OVERHEAD
+
+
+'''
+Helpers for circular doubly linked lists with a sentinel element. An empty
+list is a sentinel whose next and prev point at itself.
+'''
+def newList():
+    sentinel = CacheEntry(None, None)
+    sentinel.next = sentinel
+    sentinel.prev = sentinel
+
+    return sentinel
+
+
+def linkAfter(position, element):
+    element.prev = position
+    element.next = position.next
+    position.next.prev = element
+    position.next = element
+
+
+def unlink(element):
+    element.prev.next = element.next
+    element.next.prev = element.prev
+    element.next = None
+    element.prev = None
+
+
+
+
+'''
+Base class of the caches. Entries live in a chaining HashTable of
+CacheEntry elements. The cache is bounded by maxEntries, by maxBytes as
+estimated by sizeOf(key, value), or by both, and evicts entries picked by
+the subclass until it is back under its limits. Hits, misses, evictions and
+expirations are counted.
+'''
+class Cache:
+
+
+    def __init__(self, maxEntries=None, maxBytes=None, sizeOf=defaultSizeOf):
+        self.table = HashTable(elementType=CacheEntry)
+        self.maxEntries = maxEntries
+        self.maxBytes = maxBytes
+        self.sizeOf = sizeOf
+        self.numBytes = 0
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+
+    # returns the cached value, counting a hit or a miss. Misses raise
+    # KeyError like HashTable.get
+    def get(self, key):
+        element = self.table.findElement(key)
+
+        if element is None or self._expired(element):
+            if element is not None:
+                self.expirations += 1
+                self.__remove(element)
+
+            self.misses += 1
+            raise KeyError("Key not in cache")
+
+        self.hits += 1
+        self._touch(element)
+
+        return element.value
+
+
+    # a new key first evicts until there is room for it, so it can never be
+    # chosen as its own victim. Overwriting a key may grow its size, in which
+    # case other entries are evicted afterwards. An entry bigger than maxBytes
+    # could never fit, so it raises ValueError and leaves the cache unchanged
+    def add(self, key, value):
+        numBytes = self.sizeOf(key, value) if self.maxBytes is not None else 0
+
+        if self.maxBytes is not None and numBytes > self.maxBytes:
+            raise ValueError("Entry of " + str(numBytes) + " bytes exceeds maxBytes.")
+
+        element = self.table.findElement(key)
+
+        if element is not None:
+            element.value = value
+            self.numBytes += numBytes - element.numBytes
+            element.numBytes = numBytes
+            self._touch(element)
+
+        else:
+            while len(self.table) > 0 and self.__overLimit(1, numBytes):
+                self.__evict()
+
+            element = self.table.insertElement(key, value)
+            element.numBytes = numBytes
+            self.numBytes += numBytes
+            self._insert(element)
+
+        self._added(element)
+
+        while self.__overLimit(0, 0) and self._victim() is not element:
+            self.__evict()
+
+
+    def delete(self, key):
+        element = self.table.findElement(key)
+
+        if element is None:
+            raise KeyError("Key not in cache")
+
+        value = element.value
+        self.__remove(element)
+
+        return value
+
+
+    def __contains__(self, key):
+        element = self.table.findElement(key)
+        return element is not None and not self._expired(element)
+
+
+    def __len__(self):
+        return len(self.table)
+
+
+    # whether the cache would be over a limit after adding extraEntries
+    # entries of extraBytes bytes
+    def __overLimit(self, extraEntries, extraBytes):
+        if self.maxEntries is not None and len(self.table) + extraEntries > self.maxEntries:
+            return True
+
+        return self.maxBytes is not None and self.numBytes + extraBytes > self.maxBytes
+
+
+    def __evict(self):
+        self.evictions += 1
+        self.__remove(self._victim())
+
+
+    def __remove(self, element):
+        self._remove(element)
+        self.numBytes -= element.numBytes
+        self.table.delete(element.key)
+
+
+    def getStats(self):
+        return {
+            'entries': len(self.table),
+            'bytes': self.numBytes,
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'expirations': self.expirations
+        }
+
+
+    # hooks for the eviction policies
+    def _insert(self, element):
+        raise NotImplementedError
+
+    def _touch(self, element):
+        raise NotImplementedError
+
+    def _remove(self, element):
+        raise NotImplementedError
+
+    def _victim(self):
+        raise NotImplementedError
+
+    def _added(self, element):
+        pass
+
+    def _expired(self, element):
+        return False
+
+
+
+
+'''
+Least recently used cache. Entries are kept from most to least recently used,
+and the least recently used entry is evicted first.
+'''
+class LRUCache(Cache):
+
+
+    def __init__(self, maxEntries=None, maxBytes=None, sizeOf=defaultSizeOf):
+        super().__init__(maxEntries, maxBytes, sizeOf)
+        self.recency = newList()
+
+
+    def _insert(self, element):
+        linkAfter(self.recency, element)
+
+
+    def _touch(self, element):
+        unlink(element)
+        linkAfter(self.recency, element)
+
+
+    def _remove(self, element):
+        unlink(element)
+
+
+    def _victim(self):
+        return self.recency.prev
+
+
+
+
+'''
+Least frequently used cache. Entries with the same use count share a list
+ordered by recency, and the lists are kept in a HashTable by count. Tracking
+the smallest count in use makes finding the victim O(1). Ties are broken by
+evicting the least recently used entry.
+'''
+class LFUCache(Cache):
+
+
+    def __init__(self, maxEntries=None, maxBytes=None, sizeOf=defaultSizeOf):
+        super().__init__(maxEntries, maxBytes, sizeOf)
+        self.frequencyLists = HashTable()
+        self.minFrequency = 0
+
+
+    def __linkAtFrequency(self, element, frequency):
+        try:
+            frequencyList = self.frequencyLists.get(frequency)
+        except KeyError:
+            frequencyList = newList()
+            self.frequencyLists.add(frequency, frequencyList)
+
+        element.frequency = frequency
+        linkAfter(frequencyList, element)
+
+
+    # unlinks the element, dropping its frequency list if it is now empty
+    def __unlinkFromFrequency(self, element):
+        unlink(element)
+        frequencyList = self.frequencyLists.get(element.frequency)
+
+        if frequencyList.next is frequencyList:
+            self.frequencyLists.delete(element.frequency)
+            return True
+
+        return False
+
+
+    def _insert(self, element):
+        self.__linkAtFrequency(element, 1)
+        self.minFrequency = 1
+
+
+    def _touch(self, element):
+        frequency = element.frequency
+
+        if self.__unlinkFromFrequency(element) and frequency == self.minFrequency:
+            self.minFrequency = frequency + 1
+
+        self.__linkAtFrequency(element, frequency + 1)
+
+
+    def _remove(self, element):
+        self.__unlinkFromFrequency(element)
+
+
+    # the minimum frequency may be stale after a delete, in which case the
+    # next frequency in use is searched for. Evictions right after inserts,
+    # the common case, always find it immediately
+    def _victim(self):
+        while self.minFrequency not in self.frequencyLists:
+            self.minFrequency += 1
+
+        return self.frequencyLists.get(self.minFrequency).prev
+
+
+
+
+'''
+LRU cache whose entries expire ttl seconds after they were last written.
+Expired entries are removed lazily when they are looked up, or evicted in
+LRU order when the cache is full. add takes an optional ttl per entry, and
+clock can be replaced for testing.
+'''
+class TTLCache(LRUCache):
+
+
+    def __init__(self, ttl, maxEntries=None, maxBytes=None, sizeOf=defaultSizeOf, clock=time.monotonic):
+        super().__init__(maxEntries, maxBytes, sizeOf)
+        self.ttl = ttl
+        self.clock = clock
+        self.nextTTL = None
+
+
+    def add(self, key, value, ttl=None):
+        self.nextTTL = ttl
+        super().add(key, value)
+
+
+    def _added(self, element):
+        ttl = self.ttl if self.nextTTL is None else self.nextTTL
+        element.expires = self.clock() + ttl
+
+
+    def _expired(self, element):
+        return element.expires <= self.clock()
+
+
+
+
+'''
+Decorator that memoizes a function in the given cache, keyed on its
+positional arguments.
+'''
+def memoize(cache):
+
+    def decorator(function):
+
+        def wrapper(*args):
+            try:
+                return cache.get(args)
+            except KeyError:
+                value = function(*args)
+
+                # a result too big for the cache is returned uncached
+                try:
+                    cache.add(args, value)
+                except ValueError:
+                    pass
+
+                return value
+
+        wrapper.cache = cache
+        return wrapper
+
+    return decorator
@@ -0,0 +1,213 @@
+'''
+File: hashset.py
+Author: Joshua Jacobs-Rebhun
+Date: January 10, 2022
+
+This file implements the set ADT with the same open addressing scheme as
+OpenAddressingHashTable, minus the array of values.
+'''
+
+from hashtable import HashTable, OpenAddressingSlots, UniversalHashFamily
+
+
+# two families compute the same cached hashes if they are the same object,
+# or universal families with the same parameters, as the shared defaults are
+def sameHashFamily(family, otherFamily):
+
+    if family is otherFamily:
+        return True
+
+    return isinstance(family, UniversalHashFamily) and isinstance(otherFamily, UniversalHashFamily) and family.info() == otherFamily.info()
+
+
+# whether probing other for a key is a hash lookup rather than a scan
+def hasFastLookup(other):
+    return isinstance(other, (HashSet, HashTable, set, frozenset, dict))
+
+
+'''
+Hash set stored as two flat parallel arrays, the cached hashes and the keys,
+with linear probing and tombstones. The arrays, probing and resizing are
+shared with OpenAddressingHashTable. No value is stored per key.
+
+The in-place operators work without building intermediate lists. |= adds the
+other operand's keys after presizing once. &= walks the smaller operand and
+probes the larger one. -= either discards each key of the other operand or
+filters this set, whichever walks fewer keys. Only sets, dicts and hash
+tables are probed; any other operand of &= is first turned into a HashSet.
+When the other operand is a HashSet with the same hash family, its cached
+hashes are reused instead of hashing every key again.
+'''
+class HashSet(OpenAddressingSlots):
+
+
+    # the arguments have the same meaning as for OpenAddressingHashTable
+    def __init__(self, size=16, primeRange=(1000000, 10000000), resizePolicy=None, sharedParameters=True, hashFamily=None):
+        self._initSlots(size, primeRange, resizePolicy, sharedParameters, hashFamily)
+
+
+    # builds a set from any iterable, hashing the keys in one batch
+    @classmethod
+    def from_iterable(cls, iterable, **kwargs):
+        newSet = cls(**kwargs)
+        newSet.update(iterable)
+
+        return newSet
+
+
+    # gives memory back after a run of removals
+    def __shrinkIfSparse(self):
+        newSize = self.size
+
+        while self.numKeys < self.resizePolicy.shrinkLimit(newSize) and newSize // 2 >= self.minSize:
+            newSize //= 2
+
+        if newSize != self.size:
+            self._rebuild(newSize)
+
+
+    def add(self, key):
+        self._claimSlot(key, self.hashKey(key))
+
+
+    def discard(self, key):
+        index = self._findSlot(key, self.hashKey(key))
+
+        if index >= 0:
+            self._removeSlot(index)
+            self.__shrinkIfSparse()
+
+
+    # like discard, but raises KeyError if the key is missing
+    def remove(self, key):
+        index = self._findSlot(key, self.hashKey(key))
+
+        if index < 0:
+            raise KeyError("Key not in set")
+
+        self._removeSlot(index)
+        self.__shrinkIfSparse()
+
+
+    def __contains__(self, key):
+        return self._findSlot(key, self.hashKey(key)) >= 0
+
+
+    def __len__(self):
+        return self.numKeys
+
+
+    # yields (hashCache, key) for every key, raising if the set changes size
+    # while the generator is suspended
+    def _iterHashed(self):
+        modCount = self.modCount
+        hashSlots = self.hashSlots
+
+        for i in range(len(hashSlots)):
+            if hashSlots[i] >= 0:
+                yield (hashSlots[i], self.keySlots[i])
+
+                if self.modCount != modCount:
+                    raise RuntimeError("HashSet changed size during iteration")
+
+
+    def __iter__(self):
+        return (key for hashCache, key in self._iterHashed())
+
+
+    # (hashCache, key) pairs of other under this set's hash family, reusing
+    # the cached hashes of a HashSet with the same family
+    def __hashedKeys(self, other):
+
+        if isinstance(other, HashSet) and sameHashFamily(self.hashFamily, other.hashFamily):
+            return other._iterHashed()
+
+        keys = list(other)
+        return zip(self.hashFamily.hashMany(keys), keys)
+
+
+    # membership test for the keys of this set against other. A HashSet with
+    # the same family is probed with the cached hash instead of rehashing
+    def __memberTest(self, other):
+
+        if isinstance(other, HashSet) and sameHashFamily(self.hashFamily, other.hashFamily):
+            return lambda i: other._findSlot(self.keySlots[i], self.hashSlots[i]) >= 0
+
+        return lambda i: self.keySlots[i] in other
+
+
+    def update(self, iterable):
+
+        if hasattr(iterable, '__len__'):
+            self._presize(self.numKeys + len(iterable))
+        else:
+            iterable = list(iterable)
+            self._presize(self.numKeys + len(iterable))
+
+        for hashCache, key in self.__hashedKeys(iterable):
+            self._claimSlot(key, hashCache)
+
+
+    def __ior__(self, other):
+        self.update(other)
+        return self
+
+
+    def __iand__(self, other):
+
+        if not hasFastLookup(other):
+            other = HashSet.from_iterable(other, hashFamily=self.hashFamily)
+
+        # this set is the smaller one, so walk it and drop what other lacks
+        if len(self) <= len(other):
+            inOther = self.__memberTest(other)
+
+            for i in range(len(self.hashSlots)):
+                if self.hashSlots[i] >= 0 and not inOther(i):
+                    self._removeSlot(i)
+
+            self.__shrinkIfSparse()
+
+        # other is smaller, so walk it and keep the keys this set also has
+        else:
+            keptHashes = []
+            keptKeys = []
+
+            for hashCache, key in self.__hashedKeys(other):
+                if self._findSlot(key, hashCache) >= 0:
+                    keptHashes.append(hashCache)
+                    keptKeys.append(key)
+
+            self.__init__(self.minSize, resizePolicy=self.resizePolicy, hashFamily=self.hashFamily)
+            self._presize(len(keptKeys))
+
+            for i in range(len(keptKeys)):
+                self._claimSlot(keptKeys[i], keptHashes[i])
+
+        return self
+
+
+    def __isub__(self, other):
+
+        if other is self:
+            self.__init__(self.minSize, resizePolicy=self.resizePolicy, hashFamily=self.hashFamily)
+            return self
+
+        # filtering this set only pays off when other has fast lookups and
+        # is the larger of the two
+        if hasFastLookup(other) and len(other) > len(self):
+            inOther = self.__memberTest(other)
+
+            for i in range(len(self.hashSlots)):
+                if self.hashSlots[i] >= 0 and inOther(i):
+                    self._removeSlot(i)
+
+        else:
+            for hashCache, key in self.__hashedKeys(other):
+                index = self._findSlot(key, hashCache)
+                if index >= 0:
+                    self._removeSlot(index)
+
+        self.__shrinkIfSparse()
+
+        return self
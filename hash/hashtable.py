@@ -7,9 +7,368 @@ This file implements a hashtable data structure, which can be used to
 implement the dictionary ADT or set ADT.
 '''
 
-import sympy
+import sys
+import time
+import json
 import random
 import pickle
+import mmap
+import struct
+import hashlib
+import numbers
+import fractions
+from array import array
+
+
+# witnesses for the Miller-Rabin test. Testing against all of them gives the
+# right answer for every n below 3.3 * 10^24
+MILLER_RABIN_BASES = (2, 3, 5, 7, 11, 13, 17, 19, 23, 29, 31, 37)
+
+
+'''
+Deterministic Miller-Rabin primality test
+'''
+def isPrime(n):
+
+    if n < 2:
+        return False
+    
+    for base in MILLER_RABIN_BASES:
+        if n % base == 0:
+            return n == base
+    
+    # write n - 1 as d * 2^r with d odd
+    d = n - 1
+    r = 0
+    while d % 2 == 0:
+        d //= 2
+        r += 1
+    
+    for base in MILLER_RABIN_BASES:
+        x = pow(base, d, n)
+
+        if x == 1 or x == n - 1:
+            continue
+
+        for i in range(r - 1):
+            x = x * x % n
+            if x == n - 1:
+                break
+        else:
+            return False
+    
+    return True
+
+
+'''
+Returns a random prime in the range [low, high). Starts at a random point and
+walks forward to the next prime, wrapping around to low if needed.
+'''
+def randomPrime(low, high):
+
+    start = random.randrange(low, high)
+
+    for n in range(start, high):
+        if isPrime(n):
+            return n
+    
+    for n in range(low, start):
+        if isPrime(n):
+            return n
+    
+    raise ValueError("No prime in the range [" + str(low) + ", " + str(high) + ")")
+
+
+# one (p, a, b) parameter set per prime range, drawn the first time a table
+# with that range asks for shared parameters
+SHARED_PARAMETERS = {}
+
+
+'''
+Returns the (p, a, b) parameters of the universal hash function. Shared
+parameters are drawn once per process and reused, so creating a table costs
+no prime search at all. Pass shared=False to draw a fresh set.
+'''
+def hashParameters(primeRange, shared=True):
+
+    if shared and primeRange in SHARED_PARAMETERS:
+        return SHARED_PARAMETERS[primeRange]
+    
+    p = randomPrime(primeRange[0], primeRange[1])
+    parameters = (p, random.randint(1, p - 1), random.randint(0, p - 1))
+
+    if shared:
+        SHARED_PARAMETERS[primeRange] = parameters
+    
+    return parameters
+
+
+# default for get_many, so that None can still be passed as a real default
+MISSING = object()
+
+
+# NumPy vectorizes hashMany, but importing it is slow. So it is imported by
+# the first batch of at least NUMPY_MIN_BATCH keys and cached here: None
+# until then, and False once the import has failed
+NUMPY = None
+NUMPY_MIN_BATCH = 256
+
+
+# returns the numpy module if a batch of numKeys keys should use it, or None
+def loadNumpy(numKeys):
+    global NUMPY
+
+    if numKeys < NUMPY_MIN_BATCH:
+        return None
+
+    if NUMPY is None:
+        try:
+            import numpy
+            NUMPY = numpy
+        except ImportError:
+            NUMPY = False
+
+    return NUMPY or None
+
+
+# cached hashes of every family fit in this many bits, so they can be stored
+# in a signed 64-bit array by the open addressing engine
+HASH_BITS = 62
+HASH_MASK = (1 << HASH_BITS) - 1
+MASK64 = (1 << 64) - 1
+
+
+'''
+Interface for the hash function families a table can use. hash(key) returns
+the cached hash value, a non-negative integer below 2^HASH_BITS that is stored
+with each entry so resizing never has to rehash a key. A table of a given size
+puts the key in bucket (hashCache >> indexShift(size)) % size. Families that
+need power of 2 table sizes say so with requiresPowerOfTwo.
+'''
+class HashFamily:
+
+    requiresPowerOfTwo = False
+
+
+    def hash(self, key):
+        raise NotImplementedError
+    
+
+    def indexShift(self, size):
+        return 0
+
+
+    # hashes a whole list of keys. Families override this when they can do
+    # better than one call per key
+    def hashMany(self, keys):
+        return [self.hash(key) for key in keys]
+    
+
+    # name and parameters of the family, for debugging and statistics
+    def info(self):
+        return {'family': type(self).__name__}
+
+
+
+
+'''
+The universal family ((a*hash(key) + b) % p) % size. The default family, and
+the one the tables have always used.
+'''
+class UniversalHashFamily(HashFamily):
+
+
+    def __init__(self, primeRange=(1000000, 10000000), shared=True):
+        self.p, self.a, self.b = hashParameters(tuple(primeRange), shared)
+
+        if self.p > HASH_MASK:
+            raise ValueError("The prime range must stay below 2^" + str(HASH_BITS) + ".")
+    
+
+    def hash(self, key):
+        return (self.a*hash(key) + self.b) % self.p
+
+
+    # with NumPy available the arithmetic on large batches is vectorized.
+    # Reducing hash(key) mod p first keeps every intermediate product inside
+    # a 64-bit integer as long as p*p does too. Otherwise, a list
+    # comprehension avoids a method call per key
+    def hashMany(self, keys):
+        a, b, p = self.a, self.b, self.p
+        numpy = loadNumpy(len(keys))
+
+        if numpy is not None and (p + 1)*p < 2**63:
+            hashes = numpy.fromiter(map(hash, keys), dtype=numpy.int64, count=len(keys))
+            return ((a * (hashes % p) + b) % p).tolist()
+
+        return [(a*hash(key) + b) % p for key in keys]
+    
+
+    def info(self):
+        return {'family': 'universal', 'p': self.p, 'a': self.a, 'b': self.b}
+
+
+
+
+'''
+Multiply-shift hashing. The cached hash is (a*hash(key)) mod 2^HASH_BITS for a
+random odd a, and the bucket is its top log2(size) bits. There is no modulo
+by a prime, only one multiplication, a mask and a shift, but the table size
+has to be a power of 2.
+'''
+class MultiplyShiftHashFamily(HashFamily):
+
+    requiresPowerOfTwo = True
+
+
+    def __init__(self, seed=None):
+        generator = random.Random(seed)
+        self.a = generator.getrandbits(HASH_BITS) | 1
+    
+
+    def hash(self, key):
+        return (self.a * (hash(key) & MASK64)) & HASH_MASK
+    
+
+    def indexShift(self, size):
+        return HASH_BITS - (size.bit_length() - 1)
+    
+
+    def hashMany(self, keys):
+        a = self.a
+        numpy = loadNumpy(len(keys))
+
+        if numpy is not None:
+            hashes = numpy.fromiter(map(hash, keys), dtype=numpy.int64, count=len(keys)).view(numpy.uint64)
+            return ((hashes * numpy.uint64(a)) & numpy.uint64(HASH_MASK)).tolist()
+        
+        return [(a * (hash(key) & MASK64)) & HASH_MASK for key in keys]
+    
+
+    def info(self):
+        return {'family': 'multiplyshift', 'a': self.a}
+
+
+
+
+'''
+Simple tabulation hashing. hash(key) is split into eight bytes and each byte
+picks a random word from its own table. The eight words are XORed together.
+The family is 3-independent and needs no multiplications at all.
+'''
+class TabulationHashFamily(HashFamily):
+
+
+    def __init__(self, seed=None):
+        generator = random.Random(seed)
+        self.tables = [[generator.getrandbits(HASH_BITS) for i in range(256)] for j in range(8)]
+    
+
+    def hash(self, key):
+        x = hash(key) & MASK64
+        t0, t1, t2, t3, t4, t5, t6, t7 = self.tables
+
+        return (t0[x & 255] ^ t1[(x >> 8) & 255] ^ t2[(x >> 16) & 255] ^ t3[(x >> 24) & 255]
+                ^ t4[(x >> 32) & 255] ^ t5[(x >> 40) & 255] ^ t6[(x >> 48) & 255] ^ t7[x >> 56])
+    
+
+    def info(self):
+        return {'family': 'tabulation'}
+
+
+
+
+'''
+Keyed hashing for untrusted keys. Each key is turned into bytes and hashed
+with BLAKE2b under a secret key, which plays the role SipHash plays for
+Python's own str hashing. Without the secret, an attacker can not choose keys
+that all land in one bucket. Strings, bytes, numbers and tuples of them are
+hashed by content. Numbers are encoded by value rather than by their builtin
+hash(), which is public and wraps modulo 2^61-1, so colliding ints would be
+easy to find. Any other key falls back to its builtin hash(). This is the
+slowest family.
+'''
+class KeyedHashFamily(HashFamily):
+
+
+    def __init__(self, secret=None):
+
+        if secret is None:
+            secret = random.SystemRandom().getrandbits(128).to_bytes(16, 'little')
+        
+        self.secret = secret
+    
+
+    def hash(self, key):
+        digest = hashlib.blake2b(keyBytes(key), key=self.secret, digest_size=8).digest()
+        return int.from_bytes(digest, 'little') & HASH_MASK
+    
+
+    def info(self):
+        return {'family': 'keyed'}
+
+
+
+
+'''
+Byte encoding of a key for KeyedHashFamily. Keys that compare equal get the
+same bytes.
+'''
+def keyBytes(key):
+
+    if isinstance(key, str):
+        return b's' + key.encode('utf-8', 'surrogatepass')
+    
+    elif isinstance(key, bytes):
+        return b'b' + key
+    
+    elif isinstance(key, numbers.Number):
+        return numberBytes(key)
+    
+    elif isinstance(key, tuple):
+        parts = [b't']
+        for item in key:
+            itemBytes = keyBytes(item)
+            parts.append(len(itemBytes).to_bytes(8, 'little'))
+            parts.append(itemBytes)
+        return b''.join(parts)
+    
+    else:
+        return b'h' + hash(key).to_bytes(8, 'little', signed=True)
+
+
+# two's complement bytes of an int, as few as hold it
+def intBytes(n):
+    return n.to_bytes(n.bit_length() // 8 + 1, 'little', signed=True)
+
+
+'''
+Byte encoding of a number by its value. Numbers that compare equal get the
+same bytes whatever their type: integral floats, bools, Fractions and
+Decimals are encoded as ints, and other finite reals as exact fractions.
+Infinities and NaN fall back to hash(), which gives them fixed values.
+'''
+def numberBytes(key):
+
+    if isinstance(key, complex):
+        if key.imag != 0:
+            realBytes = numberBytes(key.real)
+            return b'c' + len(realBytes).to_bytes(8, 'little') + realBytes + numberBytes(key.imag)
+        key = key.real
+
+    if isinstance(key, numbers.Integral):
+        return b'i' + intBytes(int(key))
+
+    try:
+        ratio = fractions.Fraction(key)
+    except (TypeError, ValueError, OverflowError):
+        return b'h' + hash(key).to_bytes(8, 'little', signed=True)
+
+    if ratio.denominator == 1:
+        return b'i' + intBytes(ratio.numerator)
+
+    numeratorBytes = intBytes(ratio.numerator)
+    return b'q' + len(numeratorBytes).to_bytes(8, 'little') + numeratorBytes + intBytes(ratio.denominator)
 
 
 '''
@@ -17,18 +376,23 @@ This class is for the elements of the hashtable. It stores the key-value pairs
 and the next element and previous element pointers for purpose of iterating
 over the table (i.e. for key, value in dictionary). These are the key, value,
 next, and prev variables. The chainNext and chainPrev variables are used for
-implementing chaining in the hashtable.
+implementing chaining in the hashtable. The fields are declared in __slots__,
+so elements carry no per-instance __dict__.
 '''
 class TableElement:
 
+    __slots__ = ('key', 'value', 'chainNext', 'chainPrev', 'hashCache', 'next', 'prev')
+
 
     # constructor
-    def __init__(self, key, value, chainNext=None, chainPrev=None, hashCache=None):
+    def __init__(self, key, value, chainNext=None, chainPrev=None, hashCache=None, next=None, prev=None):
         self.key = key
         self.value = value
         self.chainNext = chainNext
         self.chainPrev = chainPrev
         self.hashCache = hashCache
+        self.next = next
+        self.prev = prev
 
 
     def isEndOfChain(self):
@@ -46,78 +410,360 @@ class TableElement:
 
 
 
+'''
+Resize policy for the hash tables. The table grows once the number of keys
+reaches growAt times its size, and halves when deletes bring the number of
+keys below shrinkAt times its size. A shrinkAt of 0 disables shrinking.
+
+The thresholds must satisfy 2*shrinkAt < growAt. Doubling at growAt then
+leaves the load above shrinkAt and halving at shrinkAt leaves it below growAt,
+so a table sitting at a threshold can not thrash between the two sizes.
+The open addressing engine is stricter, see checkOpenAddressing.
+minSize is the smallest size a table may shrink to. If it is None, tables
+never shrink below the size they were created with.
+'''
+class ResizePolicy:
+
+
+    def __init__(self, growAt=1.0, shrinkAt=0.25, minSize=None):
+
+        if growAt <= 0:
+            raise ValueError("growAt must be positive.")
+        
+        if shrinkAt < 0 or 2*shrinkAt >= growAt:
+            raise ValueError("shrinkAt must be non-negative and less than half of growAt.")
+
+        self.growAt = growAt
+        self.shrinkAt = shrinkAt
+        self.minSize = minSize
+    
+
+    # number of keys at which a table of the given size should grow
+    def growLimit(self, size):
+        return size * self.growAt
+    
+
+    # a table of the given size should shrink once it holds fewer keys than this
+    def shrinkLimit(self, size):
+        return size * self.shrinkAt
+
+
+    # open addressing counts tombstones towards growAt and doubles as soon as
+    # the live keys pass half of it, which leaves the load at growAt/4. The
+    # policy is only safe from thrashing if shrinkAt is below that
+    def checkOpenAddressing(self):
+
+        if self.growAt >= 1:
+            raise ValueError("Open addressing needs a growAt below 1.")
+
+        if 4*self.shrinkAt >= self.growAt:
+            raise ValueError("Open addressing needs a shrinkAt below a quarter of growAt.")
+
+
+
+
+'''
+Operation counters for a hash table created with collectStats=True. Probes
+are the number of entries a get, add or delete compared against. In the
+chaining engine that is the position of the key in its chain, or the chain
+length if the key is missing. In the open addressing engine it is the number
+of slots visited. Resize times cover the pause seen by the operation that
+triggered the resize. With incremental resizing that is only the start of the
+migration.
+'''
+class TableStats:
+
+
+    def __init__(self):
+        self.operations = {'get': 0, 'add': 0, 'delete': 0}
+        self.totalProbes = 0
+        self.maxProbes = 0
+        self.resizes = 0
+        self.resizeSeconds = 0.0
+        self.maxResizeSeconds = 0.0
+    
+
+    def recordProbes(self, operation, probes):
+        self.operations[operation] += 1
+        self.totalProbes += probes
+
+        if probes > self.maxProbes:
+            self.maxProbes = probes
+    
+
+    def recordResize(self, seconds):
+        self.resizes += 1
+        self.resizeSeconds += seconds
+
+        if seconds > self.maxResizeSeconds:
+            self.maxResizeSeconds = seconds
+    
+
+    def asDict(self):
+        numOperations = sum(self.operations.values())
+
+        return {
+            'operations': dict(self.operations),
+            'averageProbes': self.totalProbes / numOperations if numOperations > 0 else 0.0,
+            'maxProbes': self.maxProbes,
+            'resizes': self.resizes,
+            'resizeSeconds': self.resizeSeconds,
+            'maxResizeSeconds': self.maxResizeSeconds
+        }
+
+
+
+
 '''
 Hash table data structure can be used to implement dictionary or set ADTs. 
-This implementation uses chaining to solve collisions.
+This implementation uses chaining to solve collisions. Passing
+engine='openaddressing' to the constructor builds an OpenAddressingHashTable
+instead, which has the same interface but stores its entries in flat arrays.
 '''
 class HashTable:
     
 
+    # the engine is chosen at construction time. Both engines share the
+    # add/get/delete interface, so callers only need to pick one. engine and
+    # the options after it are keyword-only, so an engine can never be
+    # passed positionally and then ignored here
+    def __new__(cls, *args, engine='chaining', **kwargs):
+
+        if engine not in ('chaining', 'openaddressing'):
+            raise ValueError("Not a valid engine. Options are: chaining and openaddressing.")
+
+        if cls is HashTable and engine == 'openaddressing':
+            cls = OpenAddressingHashTable
+
+        return super().__new__(cls)
+
+
     # __getHash returns a closure for dynamically altering the hash function
     # as the table changes size
     def __getHash(self, size):
+        hashKey = self.hashKey
+        shift = self.hashFamily.indexShift(size)
         
         def __hash(key):
-            return ((self.a*hash(key) + self.b) % self.p) % size
+            return (hashKey(key) >> shift) % size
         
         return __hash
     
     
-    # caching the hash value allows for faster table doubling
-    def __getHashCache(self, key):
-        return (self.a*hash(key) + self.b) %self.p
-    
-    
-    # size should be a power of 2
-    def __init__(self, size=16, primeRange=(1000000, 10000000)):
+    # size should be a power of 2. With incrementalResize set, doubling the
+    # table does not rehash everything at once. Instead the old and new bucket
+    # arrays are both kept and every add, get and delete moves up to
+    # rehashStep buckets over until the old array is empty. resizePolicy
+    # defaults to growing when the table is full and halving it when it drops
+    # under a quarter full. hashFamily defaults to the universal family, whose
+    # parameters are shared by all tables with the same prime range unless
+    # sharedParameters is False. collectStats turns on the counters reported
+    # by getStats. elementType is the class used for the table's elements and
+    # may be a subclass of TableElement carrying extra fields
+    def __init__(self, size=16, primeRange=(1000000, 10000000), *, engine='chaining', incrementalResize=False, rehashStep=1, resizePolicy=None, sharedParameters=True, hashFamily=None, collectStats=False, elementType=TableElement):
+
+        if hashFamily is None:
+            hashFamily = UniversalHashFamily(primeRange, sharedParameters)
+        
+        if hashFamily.requiresPowerOfTwo and size & (size - 1) != 0:
+            raise ValueError(type(hashFamily).__name__ + " needs a power of 2 table size.")
+
         self.size = size
         self.table = [None] * size
         self.numKeys = 0
-        self.p = sympy.randprime(primeRange[0], primeRange[1])
-        self.a = random.randint(1, self.p - 1)
-        self.b = random.randint(0, self.p - 1)
+        self.hashFamily = hashFamily
+        self.hashKey = hashFamily.hash
         self.hashFunc = self.__getHash(size)
+        self.elementType = elementType
+
+        self.incrementalResize = incrementalResize
+        self.rehashStep = rehashStep
+
+        # bucket array being migrated away from. Buckets below rehashIndex
+        # have already been moved into self.table
+        self.oldTable = None
+        self.oldSize = 0
+        self.rehashIndex = 0
+
+        # modCount changes whenever a key is added or removed, which lets
+        # iterators notice that the table changed underneath them
+        self.modCount = 0
+        self.activeIterators = 0
+
+        # operation counters are only kept when asked for. Every hot path
+        # pays a single None check when they are off
+        self.stats = TableStats() if collectStats else None
+
+        if resizePolicy is None:
+            resizePolicy = ResizePolicy()
+        
+        self.resizePolicy = resizePolicy
+        self.minSize = size if resizePolicy.minSize is None else resizePolicy.minSize
+        self.__updateLimits()
     
 
-    def __doubleTable(self):
-        newSize = self.size * 2
+    # recomputes the grow and shrink thresholds and the bucket index shift
+    # after the size changes
+    def __updateLimits(self):
+        self.growLimit = self.resizePolicy.growLimit(self.size)
+        self.shrinkLimit = self.resizePolicy.shrinkLimit(self.size)
+        self.shift = self.hashFamily.indexShift(self.size)
+
+
+    # moves every element of bucket i of oldArray to the front of its chain
+    # in newArray
+    def __moveBucket(self, oldArray, i, newArray, newSize):
+        currentElement = oldArray[i]
+        oldArray[i] = None
+        shift = self.hashFamily.indexShift(newSize)
+
+        while currentElement is not None:
+            nextElement = currentElement.chainNext
+            index = (currentElement.hashCache >> shift) % newSize
+
+            currentElement.chainPrev = None
+            currentElement.chainNext = newArray[index]
+            if newArray[index] is not None:
+                newArray[index].chainPrev = currentElement
+            newArray[index] = currentElement
+
+            currentElement = nextElement
+
+
+    # rehashes every element into a bucket array of the given size using the
+    # cached hash values. Used for both doubling and halving the table
+    def __resizeTable(self, newSize):
         newArray = [None] * newSize
 
-        for i in range(size):
-            while self.table[i] is not None:
-                currentElement = self.table[i]
-                
-                if currentElement.isLengthOneChain():
-                    self.table[i] = None
-                else:
-                    currentElement.chainNext.chainPrev = None
-                    self.table[i] = currentElement.chainNext
-                    currentElement.chainNext = None
-                
-                if newArray[currentElement.hashCache % newSize] is None:
-                    newArray[currentElement.hashCache % newSize] = currentElement
-                else:
-                    insertAfter = newArray[currentElement.hashCache % newSize]
-                    while insertAfter.chainNext is not None:
-                        insertAfter = insertAfter.chainNext
-                    
-                    insertAfter.chainNext = currentElement
-                    currentElement.chainPrev = insertAfter
+        for i in range(self.size):
+            if self.table[i] is not None:
+                self.__moveBucket(self.table, i, newArray, newSize)
         
         self.table = newArray
         self.size = newSize
         self.hashFunc = self.__getHash(self.size)
+        self.__updateLimits()
+    
+
+    # starts an incremental resize. New lookups go to whichever array
+    # currently holds the key's bucket
+    def __startMigration(self, newSize):
+        self.oldTable = self.table
+        self.oldSize = self.size
+        self.oldShift = self.shift
+        self.rehashIndex = 0
+
+        self.size = newSize
+        self.table = [None] * self.size
+        self.hashFunc = self.__getHash(self.size)
+        self.__updateLimits()
+
+
+    # resizes either all at once or incrementally, depending on the mode
+    def __resize(self, newSize):
+        if self.stats is not None:
+            startTime = time.perf_counter()
+
+        if not self.incrementalResize:
+            self.__resizeTable(newSize)
+        else:
+            self.__finishMigration()
+            self.__startMigration(newSize)
+            self.__rehashStepOnce()
+        
+        if self.stats is not None:
+            self.stats.recordResize(time.perf_counter() - startTime)
+    
+
+    # number of elements compared while looking for key in a bucket
+    def __countProbes(self, table, index, key):
+        probes = 0
+        element = table[index]
+
+        while element is not None:
+            probes += 1
+            if element.key == key:
+                break
+            element = element.chainNext
+        
+        return probes
+    
+
+    # moves up to rehashStep non-empty buckets into the new array. Like the
+    # Redis dict, at most ten empty buckets per step are skipped so that one
+    # call never has to scan a long empty stretch of the old array
+    def __rehashStepOnce(self):
+        bucketsLeft = self.rehashStep
+        emptyVisits = self.rehashStep * 10
+
+        while bucketsLeft > 0 and self.rehashIndex < self.oldSize:
+            if self.oldTable[self.rehashIndex] is None:
+                emptyVisits -= 1
+                if emptyVisits == 0:
+                    self.rehashIndex += 1
+                    break
+            else:
+                self.__moveBucket(self.oldTable, self.rehashIndex, self.table, self.size)
+                bucketsLeft -= 1
+            
+            self.rehashIndex += 1
+        
+        if self.rehashIndex >= self.oldSize:
+            self.oldTable = None
+            self.oldSize = 0
+            self.rehashIndex = 0
+
+
+    # finishes an in-progress migration in one go
+    def __finishMigration(self):
+        while self.oldTable is not None:
+            self.__rehashStepOnce()
+    
+
+    # returns the bucket array and index that hold the key. While migrating,
+    # a key whose old bucket has not been moved yet is still in the old array
+    def __locate(self, hashCache):
+        if self.oldTable is not None:
+            oldIndex = (hashCache >> self.oldShift) % self.oldSize
+            if oldIndex >= self.rehashIndex:
+                return self.oldTable, oldIndex
+        
+        return self.table, (hashCache >> self.shift) % self.size
+
+
+    # bucket array and index for a cached hash, migrating or not
+    def __bucketOf(self, hashCache):
+        if self.oldTable is None:
+            return self.table, (hashCache >> self.shift) % self.size
+
+        return self.__locate(hashCache)
 
 
     def get(self, key):
-        index = self.hashFunc(key)
+        return self._getHashed(key, self.hashKey(key))
+
+
+    # get with the cached hash value already computed, so bulk lookups can
+    # hash all of their keys in one batch
+    def _getHashed(self, key, hashCache):
+        table = self.table
+
+        if self.oldTable is None:
+            index = (hashCache >> self.shift) % self.size
+        else:
+            if not self.activeIterators:
+                self.__rehashStepOnce()
+            table, index = self.__locate(hashCache)
+        
+        if self.stats is not None:
+            self.stats.recordProbes('get', self.__countProbes(table, index, key))
 
         returnValue = None
 
-        if self.table[index] is None:
+        if table[index] is None:
             raise KeyError("Key not in hashtable")
         else:
-            element = self.table[index]
+            element = table[index]
 
             while element.key != key and element.chainNext is not None:
                 element = element.chainNext
@@ -132,51 +778,104 @@ class HashTable:
 
     # get rid of possible duplicates
     def add(self, key, value):
-        
-        if self.size <= self.numKeys:
-            self.__doubleTable()
+        self._addHashed(key, value, self.hashKey(key))
+    
 
-        index = self.hashFunc(key)
+    # add with the cached hash value already computed
+    def _addHashed(self, key, value, hashCache):
+        
+        # migration is paused while iterators are walking the buckets
+        if self.oldTable is not None and not self.activeIterators:
+            self.__rehashStepOnce()
 
-        elementToInsert = TableElement(key, value)
-        elementToInsert.hashCache = self.__getHashCache(key)
+        table, index = self.__bucketOf(hashCache)
+        
+        if self.stats is not None:
+            self.stats.recordProbes('add', self.__countProbes(table, index, key))
 
-        # if collision, then append table element to end of list
-        if self.table[index] is not None:
-            node = self.table[index]
+        node = table[index]
+        last = None
 
-            # move through linked list
-            while node.key != key and node.chainNext is not None:
-                node = node.chainNext
-            
-            # overwriting existing key-value pair
+        # overwriting existing key-value pair. This happens before any resize,
+        # so iterators stay valid while existing keys are updated
+        while node is not None:
             if node.key == key:
                 node.value = value
-            
-            # link up new node
-            else:
-                node.chainNext = elementToInsert
-                elementToInsert.chainPrev = node
-                self.numKeys += 1
+                return node
+            last = node
+            node = node.chainNext
+
+        # only a new key can grow the table, after which its chain is found again
+        if self.numKeys >= self.growLimit:
+            self.__resize(self.size * 2)
+            table, index = self.__bucketOf(hashCache)
+            last = table[index]
+
+            while last is not None and last.chainNext is not None:
+                last = last.chainNext
+
+        elementToInsert = self.elementType(key, value, hashCache=hashCache)
 
-        # if no collision, insert element in desired slot
+        # if collision, then append table element to end of list
+        if last is not None:
+            last.chainNext = elementToInsert
+            elementToInsert.chainPrev = last
         else:
-            self.table[index] = elementToInsert
-            self.numKeys += 1
+            table[index] = elementToInsert
+
+        self.numKeys += 1
+        self.modCount += 1
         
+        return elementToInsert
+    
 
+    # adds the key like add, but returns the TableElement that now holds it.
+    # Structures built on top of the table, like the caches, keep their own
+    # links through the element's next and prev fields
+    def insertElement(self, key, value):
+        return self._addHashed(key, value, self.hashKey(key))
     
 
-    def delete(self, key):
-        index = self.hashFunc(key)
+    # returns the TableElement holding the key, or None if it is not there
+    def findElement(self, key):
+        hashCache = self.hashKey(key)
+        table = self.table
+
+        if self.oldTable is None:
+            index = (hashCache >> self.shift) % self.size
+        else:
+            if not self.activeIterators:
+                self.__rehashStepOnce()
+            table, index = self.__locate(hashCache)
+        
+        element = table[index]
+
+        while element is not None and element.key != key:
+            element = element.chainNext
+        
+        return element
+
+
+    def delete(self, key):
+        table = self.table
+
+        if self.oldTable is None:
+            index = self.hashFunc(key)
+        else:
+            if not self.activeIterators:
+                self.__rehashStepOnce()
+            table, index = self.__locate(self.hashKey(key))
+        
+        if self.stats is not None:
+            self.stats.recordProbes('delete', self.__countProbes(table, index, key))
 
         valueToReturn = None
 
-        if self.table[index] is None:
+        if table[index] is None:
             raise KeyError("Key not in hashtable")
         
         else:
-            element = self.table[index]
+            element = table[index]
 
             while element.key != key and element.chainNext is not None:
                 element = element.chainNext
@@ -184,7 +883,7 @@ class HashTable:
             if element.key == key:
                 if element.isLengthOneChain():
                     valueToReturn = element.value
-                    self.table[index] = None
+                    table[index] = None
                     self.numKeys -= 1
 
                 elif element.isEndOfChain():
@@ -195,7 +894,7 @@ class HashTable:
                 
                 elif element.isBeginningOfChain():
                     valueToReturn = element.value
-                    self.table[index] = element.chainNext
+                    table[index] = element.chainNext
                     element.chainNext.chainPrev = None
                     element.chainNext = None
                     self.numKeys -= 1
@@ -211,47 +910,833 @@ class HashTable:
             else:
                 raise KeyError("Key not in hashtable")
 
+        self.modCount += 1
+
+        # give memory back once the table has drained
+        if self.numKeys < self.shrinkLimit and self.size // 2 >= self.minSize:
+            self.__resize(self.size // 2)
+
         return valueToReturn
     
 
-    def iterate(self):
-        kvpairs = []
+    # grows the table once so that numKeys keys fit without another resize.
+    # Bulk loads are stop-the-world even in incremental mode
+    def _presize(self, numKeys):
+        newSize = self.size
+
+        while numKeys >= self.resizePolicy.growLimit(newSize):
+            newSize *= 2
+        
+        if newSize != self.size:
+            if self.stats is not None:
+                startTime = time.perf_counter()
+
+            self.__finishMigration()
+            self.__resizeTable(newSize)
+
+            if self.stats is not None:
+                self.stats.recordResize(time.perf_counter() - startTime)
+
+
+    # adds every (key, value) pair from items, which may also be a dict or
+    # another hash table. The table is sized once up front and all of the
+    # keys are hashed in one batch
+    def update(self, items):
+
+        if hasattr(items, 'items'):
+            items = items.items()
+
+        if not isinstance(items, list):
+            items = list(items)
+        
+        hashes = self.hashFamily.hashMany([item[0] for item in items])
+        self._presize(self.numKeys + len(items))
+
+        addHashed = self._addHashed
+        for i in range(len(items)):
+            addHashed(items[i][0], items[i][1], hashes[i])
+    
+
+    # builds a new table from (key, value) pairs. Keyword arguments are passed
+    # on to the constructor, so the engine and policy can still be chosen
+    @classmethod
+    def from_items(cls, items, **kwargs):
+        table = cls(**kwargs)
+        table.update(items)
+
+        return table
+    
+
+    # looks up many keys at once and returns their values in order. Missing
+    # keys raise KeyError unless a default is given
+    def get_many(self, keys, default=MISSING):
+
+        if not isinstance(keys, list):
+            keys = list(keys)
+        
+        hashes = self.hashFamily.hashMany(keys)
+        getHashed = self._getHashed
+        values = []
+
+        for i in range(len(keys)):
+            try:
+                values.append(getHashed(keys[i], hashes[i]))
+            except KeyError:
+                if default is MISSING:
+                    raise
+                values.append(default)
+        
+        return values
+
+
+    # how many buckets hold chains of each length, across both bucket
+    # arrays while migrating
+    def _structureStats(self):
+        histogram = {}
+
+        for table in self.__bucketArrays():
+            for i in range(len(table)):
+                length = 0
+                element = table[i]
 
-        for i in range(len(self.table)):
-            if self.table[i] is not None:
-                element = self.table[i]
                 while element is not None:
-                    kvtuple = (element.key, element.value)
-                    kvpairs.append(kvtuple)
+                    length += 1
                     element = element.chainNext
+                
+                histogram[length] = histogram.get(length, 0) + 1
         
+        return {'chainLengthHistogram': dict(sorted(histogram.items())), 'migrating': self.oldTable is not None}
+
+
+    # reports the shape of the table and its hash parameters. If the table
+    # was created with collectStats, the operation counters are included too
+    def getStats(self):
+        stats = {
+            'engine': type(self).__name__,
+            'size': self.size,
+            'numKeys': self.numKeys,
+            'loadFactor': self.numKeys / self.size,
+            'hashFamily': self.hashFamily.info()
+        }
+        stats.update(self._structureStats())
+
+        if self.stats is not None:
+            stats.update(self.stats.asDict())
+        
+        return stats
+    
 
-        return kvpairs
+    # writes getStats to a JSON file
+    def dumpStats(self, path):
+        with open(path, 'w') as statsFile:
+            json.dump(self.getStats(), statsFile, indent=4)
 
+
+    # writes the table to a snapshot file that MappedHashTable can open
+    def save(self, path):
+        saveSnapshot(self, path)
     
+
+    # opens a snapshot written by save as a read-only, memory-mapped table
+    @staticmethod
+    def load(path):
+        return MappedHashTable(path)
+
+
+    # bucket arrays currently holding elements. While migrating, this is
+    # the old array followed by the new one
+    def __bucketArrays(self):
+        if self.oldTable is None:
+            return [self.table]
+        else:
+            return [self.oldTable, self.table]
+
+
+    # generator behind the iteration views. Walks the buckets lazily and
+    # raises if a key is added or removed while it is suspended
+    def _iterItems(self):
+        modCount = self.modCount
+        self.activeIterators += 1
+
+        try:
+            for table in self.__bucketArrays():
+                for i in range(len(table)):
+                    element = table[i]
+
+                    while element is not None:
+                        yield (element.key, element.value)
+
+                        if self.modCount != modCount:
+                            raise RuntimeError("HashTable changed size during iteration")
+
+                        element = element.chainNext
+        finally:
+            self.activeIterators -= 1
+
+
+    def __len__(self):
+        return self.numKeys
+    
+
+    def __iter__(self):
+        return iter(self.keys())
+    
+
+    def __contains__(self, key):
+        try:
+            self.get(key)
+            return True
+        except KeyError:
+            return False
+
+
+    # items, keys and values return lazy views of the table. Nothing is
+    # copied, and iterating a view walks the buckets as it goes
+    def items(self):
+        return TableView(self, ITEMS_VIEW)
+    
+
     def keys(self):
-        keys = []
+        return TableView(self, KEYS_VIEW)
+    
 
-        for i in range(len(self.table)):
-            if self.table[i] is not None:
-                element = self.table[i]
-                while element is not None:
-                    keys.append(element.key)
-                    element = element.chainNext
+    def values(self):
+        return TableView(self, VALUES_VIEW)
+
+
+    # kept for older callers, same as items
+    def iterate(self):
+        return self.items()
+
+
+
+
+# the kinds of view that TableView can present
+ITEMS_VIEW = 0
+KEYS_VIEW = 1
+VALUES_VIEW = 2
+
+
+'''
+Lazy view over the keys, values or (key, value) pairs of a hash table, like
+the views returned by dict.keys(). A view holds no copy of the data and
+always reflects the current contents of the table.
+'''
+class TableView:
+
+
+    def __init__(self, table, kind):
+        self.table = table
+        self.kind = kind
+    
+
+    def __len__(self):
+        return len(self.table)
+    
+
+    def __iter__(self):
+        if self.kind == ITEMS_VIEW:
+            return self.table._iterItems()
+        elif self.kind == KEYS_VIEW:
+            return (item[0] for item in self.table._iterItems())
+        else:
+            return (item[1] for item in self.table._iterItems())
+
+
+
+
+# markers stored in the hash array of the open addressing engine. Cached
+# hashes are never negative, so they can not be confused with real entries
+EMPTY_SLOT = -1
+DELETED_SLOT = -2
+
+
+'''
+Flat slot arrays shared by the open addressing table and HashSet. The cached
+hashes are kept in an array of machine integers, and every name in slotNames
+is a parallel list holding the keys and whatever else is stored per key.
+Collisions are resolved by linear probing, and deleted slots are marked with
+a tombstone until the arrays are rebuilt.
+'''
+class OpenAddressingSlots:
+
+    slotNames = ('keySlots',)
+
+
+    # sets up empty arrays, defaulting and validating the policy and family
+    # the same way for every open addressing structure
+    def _initSlots(self, size, primeRange, resizePolicy, sharedParameters, hashFamily):
+
+        if resizePolicy is None:
+            resizePolicy = ResizePolicy(growAt=0.75, shrinkAt=0.125)
+
+        resizePolicy.checkOpenAddressing()
+
+        if hashFamily is None:
+            hashFamily = UniversalHashFamily(primeRange, sharedParameters)
+
+        if hashFamily.requiresPowerOfTwo and size & (size - 1) != 0:
+            raise ValueError(type(hashFamily).__name__ + " needs a power of 2 table size.")
+
+        self.size = size
+        self.numKeys = 0
+        self.numDeleted = 0
+        self.hashFamily = hashFamily
+        self.hashKey = hashFamily.hash
+        self.hashSlots = array('q', [EMPTY_SLOT]) * size
+        self.modCount = 0
+
+        for name in self.slotNames:
+            setattr(self, name, [None] * size)
+
+        self.resizePolicy = resizePolicy
+        self.minSize = size if resizePolicy.minSize is None else resizePolicy.minSize
+        self._updateLimits()
+
+
+    def _updateLimits(self):
+        self.growLimit = self.resizePolicy.growLimit(self.size)
+        self.shrinkLimit = self.resizePolicy.shrinkLimit(self.size)
+        self.shift = self.hashFamily.indexShift(self.size)
+
+
+    # returns the slot holding the key, or -1 if the key is not stored
+    def _findSlot(self, key, hashCache):
+        hashSlots = self.hashSlots
+        keySlots = self.keySlots
+        size = self.size
+        index = (hashCache >> self.shift) % size
+
+        while True:
+            slotHash = hashSlots[index]
+
+            if slotHash == hashCache:
+                slotKey = keySlots[index]
+                if slotKey is key or slotKey == key:
+                    return index
+            
+            elif slotHash == EMPTY_SLOT:
+                return -1
+            
+            index += 1
+            if index == size:
+                index = 0
+
+
+    # moves every live entry into fresh arrays of the given size. This also
+    # throws away all of the tombstones
+    def _rebuild(self, newSize):
+        oldHashes = self.hashSlots
+        oldSlots = [getattr(self, name) for name in self.slotNames]
+
+        hashSlots = array('q', [EMPTY_SLOT]) * newSize
+        newSlots = [[None] * newSize for name in self.slotNames]
+        shift = self.hashFamily.indexShift(newSize)
+
+        for i in range(len(oldHashes)):
+            hashCache = oldHashes[i]
+
+            if hashCache < 0:
+                continue
+
+            index = (hashCache >> shift) % newSize
+            while hashSlots[index] != EMPTY_SLOT:
+                index += 1
+                if index == newSize:
+                    index = 0
+            
+            hashSlots[index] = hashCache
+            for j in range(len(newSlots)):
+                newSlots[j][index] = oldSlots[j][i]
+        
+        self.hashSlots = hashSlots
+        for j in range(len(newSlots)):
+            setattr(self, self.slotNames[j], newSlots[j])
+
+        self.size = newSize
+        self.numDeleted = 0
+        self._updateLimits()
+
+
+    # grows the arrays once so that numKeys keys fit without a rebuild
+    def _presize(self, numKeys):
+        newSize = self.size
+
+        while numKeys + self.numDeleted + 1 > self.resizePolicy.growLimit(newSize):
+            newSize *= 2
+        
+        if newSize != self.size:
+            self._rebuild(newSize)
+
+
+    # returns the slot of the key, storing the key first if it is new. Only a
+    # new key may rebuild the arrays, so updating existing keys never moves
+    # them under a live iterator
+    def _claimSlot(self, key, hashCache):
+        hashSlots = self.hashSlots
+        keySlots = self.keySlots
+        size = self.size
+        index = (hashCache >> self.shift) % size
+        firstTombstone = -1
+
+        # probe until an empty slot is found, remembering the first tombstone
+        # on the way so that it can be reused
+        while True:
+            slotHash = hashSlots[index]
+
+            if slotHash == hashCache:
+                slotKey = keySlots[index]
+                if slotKey is key or slotKey == key:
+                    return index
+            
+            elif slotHash == EMPTY_SLOT:
+                break
+
+            elif slotHash == DELETED_SLOT and firstTombstone < 0:
+                firstTombstone = index
+            
+            index += 1
+            if index == size:
+                index = 0
+
+        # the key is new and one more would pass the limit. If the live keys
+        # alone would fill most of the arrays, double them. Otherwise they are
+        # clogged with tombstones, so rebuild in place and probe again
+        if self.numKeys + self.numDeleted + 1 > self.growLimit:
+            if 2*(self.numKeys + 1) > self.growLimit:
+                self._rebuild(self.size * 2)
+            else:
+                self._rebuild(self.size)
+
+            return self._claimSlot(key, hashCache)
+        
+        if firstTombstone >= 0:
+            index = firstTombstone
+            self.numDeleted -= 1
         
+        hashSlots[index] = hashCache
+        keySlots[index] = key
+        self.numKeys += 1
+        self.modCount += 1
 
-        return keys
+        return index
+
+
+    # leaves a tombstone so later probes keep going past this slot
+    def _removeSlot(self, index):
+        self.hashSlots[index] = DELETED_SLOT
+
+        for name in self.slotNames:
+            getattr(self, name)[index] = None
+
+        self.numKeys -= 1
+        self.numDeleted += 1
+        self.modCount += 1
+
+
+'''
+Open addressing engine for the hash table. Rather than allocating a
+TableElement per key and chaining them together, the cached hashes, keys and
+values are kept in three flat parallel arrays and collisions are resolved by
+linear probing. The cached hashes are stored as machine integers, so most
+slots can be rejected with a single integer comparison and no per-key
+objects are needed.
+
+Deleted slots are marked with a tombstone so that probe sequences running
+through them are not cut short. Later inserts reuse tombstones, and they are
+cleared out whenever the arrays are rebuilt.
+'''
+class OpenAddressingHashTable(OpenAddressingSlots, HashTable):
+
+    slotNames = ('keySlots', 'valueSlots')
+
+
+    # size should be a power of 2. Incremental resizing is only supported by
+    # the chaining engine, and so are custom element types since this engine
+    # has no elements. The growAt of the resize policy is the fraction of
+    # slots (keys and tombstones) that may be in use before the arrays are
+    # rebuilt, and it must stay below 1 so every probe reaches an empty slot
+    def __init__(self, size=16, primeRange=(1000000, 10000000), *, engine='openaddressing', incrementalResize=False, rehashStep=1, resizePolicy=None, sharedParameters=True, hashFamily=None, collectStats=False, elementType=TableElement):
+
+        if incrementalResize:
+            raise ValueError("Incremental resizing is only supported by the chaining engine.")
+        
+        if elementType is not TableElement:
+            raise ValueError("Custom element types are only supported by the chaining engine.")
+        
+        self._initSlots(size, primeRange, resizePolicy, sharedParameters, hashFamily)
+        self.stats = TableStats() if collectStats else None
+
+
+    # number of slots visited while looking for key
+    def __countProbes(self, key, hashCache):
+        hashSlots = self.hashSlots
+        index = (hashCache >> self.shift) % self.size
+        probes = 1
+
+        while hashSlots[index] != EMPTY_SLOT:
+            if hashSlots[index] == hashCache and self.keySlots[index] == key:
+                break
+
+            probes += 1
+            index += 1
+            if index == self.size:
+                index = 0
+        
+        return probes
+
+
+    # times the rebuilds when collecting statistics
+    def _rebuild(self, newSize):
+        if self.stats is None:
+            super()._rebuild(newSize)
+            return
+
+        startTime = time.perf_counter()
+        super()._rebuild(newSize)
+        self.stats.recordResize(time.perf_counter() - startTime)
+
+
+    def get(self, key):
+        hashCache = self.hashKey(key)
+        hashSlots = self.hashSlots
+        size = self.size
+        index = (hashCache >> self.shift) % size
+
+        if self.stats is not None:
+            self.stats.recordProbes('get', self.__countProbes(key, hashCache))
+
+        # the probe loop is inlined here since get is the hottest path
+        while True:
+            slotHash = hashSlots[index]
+
+            if slotHash == hashCache:
+                slotKey = self.keySlots[index]
+                if slotKey is key or slotKey == key:
+                    return self.valueSlots[index]
+            
+            elif slotHash == EMPTY_SLOT:
+                raise KeyError("Key not in hashtable")
+            
+            index += 1
+            if index == size:
+                index = 0
+
+
+    def _getHashed(self, key, hashCache):
+        if self.stats is not None:
+            self.stats.recordProbes('get', self.__countProbes(key, hashCache))
+
+        index = self._findSlot(key, hashCache)
+
+        if index < 0:
+            raise KeyError("Key not in hashtable")
+
+        return self.valueSlots[index]
+
+
+    def add(self, key, value):
+        self._addHashed(key, value, self.hashKey(key))
+
+
+    def _addHashed(self, key, value, hashCache):
+        if self.stats is not None:
+            self.stats.recordProbes('add', self.__countProbes(key, hashCache))
+
+        # claimed first, as claiming a slot may replace the value array
+        index = self._claimSlot(key, hashCache)
+        self.valueSlots[index] = value
+
+
+    def delete(self, key):
+        hashCache = self.hashKey(key)
+        index = self._findSlot(key, hashCache)
+
+        if self.stats is not None:
+            self.stats.recordProbes('delete', self.__countProbes(key, hashCache))
+
+        if index < 0:
+            raise KeyError("Key not in hashtable")
+        
+        valueToReturn = self.valueSlots[index]
+        self._removeSlot(index)
+
+        if self.numKeys < self.shrinkLimit and self.size // 2 >= self.minSize:
+            self._rebuild(self.size // 2)
+
+        return valueToReturn
+
+
+    # how many keys sit each number of slots away from their home slot,
+    # counting the home slot itself as a probe length of 1
+    def _structureStats(self):
+        histogram = {}
+
+        for i in range(self.size):
+            hashCache = self.hashSlots[i]
+
+            if hashCache >= 0:
+                home = (hashCache >> self.shift) % self.size
+                length = (i - home) % self.size + 1
+                histogram[length] = histogram.get(length, 0) + 1
+        
+        return {'probeLengthHistogram': dict(sorted(histogram.items())), 'tombstones': self.numDeleted}
+
+
+    def _iterItems(self):
+        modCount = self.modCount
+        hashSlots = self.hashSlots
+
+        for i in range(len(hashSlots)):
+            if hashSlots[i] >= 0:
+                yield (self.keySlots[i], self.valueSlots[i])
+
+                if self.modCount != modCount:
+                    raise RuntimeError("HashTable changed size during iteration")
+
+
+
+
+'''
+Hash of a key that is the same in every process. Python salts the hashes of
+str and bytes per process, so they are hashed with BLAKE2 here instead. Numbers
+keep their builtin hash, which is not salted and already agrees between equal
+ints, floats and bools. Tuples and frozensets combine the hashes of their
+items. Other key types can not be hashed reproducibly and raise TypeError.
+'''
+def stableHash(key):
+
+    if isinstance(key, str):
+        key = key.encode('utf-8', 'surrogatepass')
+
+    if isinstance(key, bytes):
+        return int.from_bytes(hashlib.blake2b(key, digest_size=8).digest(), 'little')
+    
+    elif isinstance(key, numbers.Number):
+        return hash(key)
+    
+    elif key is None:
+        return 0x6e6f6e65
+    
+    elif isinstance(key, tuple):
+        combined = 0x345678 + len(key)
+        for item in key:
+            combined = ((combined * 1000003) ^ stableHash(item)) & 0xffffffffffffffff
+        return combined
+    
+    elif isinstance(key, frozenset):
+        combined = len(key)
+        for item in key:
+            combined ^= (stableHash(item) * 0x9e3779b97f4a7c15) & 0xffffffffffffffff
+        return combined
+    
+    else:
+        raise TypeError("Keys of type " + type(key).__name__ + " can not be stored in a snapshot")
+
+
+
+
+# snapshot file layout. Every field is a little-endian unsigned 64-bit
+# integer, so each section can be mapped directly as an array:
+#
+#   header       magic, numKeys, size, and the a, b, p of a universal family
+#   buckets      size + 1 entry indices. Bucket i owns the entries from
+#                buckets[i] up to buckets[i+1]
+#   hashes       numKeys cached hashes, (a*stableHash(key) + b) % p
+#   keyStarts    numKeys + 1 blob offsets. Entry i is the pickled key from
+#                keyStarts[i] followed by the pickled value from valueStarts[i]
+#                up to keyStarts[i+1]
+#   valueStarts  numKeys blob offsets
+#   blob         the pickled keys and values
+SNAPSHOT_MAGIC = b'HTSNAP01'
+SNAPSHOT_HEADER = struct.Struct('<8sQQQQQ')
+
+
+'''
+Writes the contents of a hash table to path in the snapshot format above.
+Entries are grouped by bucket with a counting sort, so the bucket section is
+a prefix sum over the entries rather than a linked structure.
+'''
+def saveSnapshot(table, path):
+
+    items = list(table.items())
+    numKeys = len(items)
+
+    # the snapshot always uses the universal family over stableHash, so a
+    # table using another family borrows the shared universal parameters
+    family = table.hashFamily
+    if not isinstance(family, UniversalHashFamily):
+        family = UniversalHashFamily()
+    
+    a, b, p = family.a, family.b, family.p
+
+    size = 1
+    while size < numKeys:
+        size *= 2
+    
+    hashes = [(a*stableHash(key) + b) % p for key, value in items]
+
+    buckets = array('Q', [0]) * (size + 1)
+    for hashCache in hashes:
+        buckets[hashCache % size + 1] += 1
+    for i in range(size):
+        buckets[i + 1] += buckets[i]
+    
+    # place each entry at the next free position of its bucket
+    order = [0] * numKeys
+    nextFree = buckets[:size]
+    for i in range(numKeys):
+        bucket = hashes[i] % size
+        order[nextFree[bucket]] = i
+        nextFree[bucket] += 1
+    
+    sortedHashes = array('Q', [hashes[i] for i in order])
+    keyStarts = array('Q', [0]) * (numKeys + 1)
+    valueStarts = array('Q', [0]) * numKeys
+    chunks = []
+    offset = 0
+
+    for position in range(numKeys):
+        key, value = items[order[position]]
+        pickledKey = pickle.dumps(key, protocol=pickle.HIGHEST_PROTOCOL)
+        pickledValue = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+
+        keyStarts[position] = offset
+        valueStarts[position] = offset + len(pickledKey)
+        offset += len(pickledKey) + len(pickledValue)
+
+        chunks.append(pickledKey)
+        chunks.append(pickledValue)
+    
+    keyStarts[numKeys] = offset
+
+    if sys.byteorder != 'little':
+        for section in (buckets, sortedHashes, keyStarts, valueStarts):
+            section.byteswap()
+
+    with open(path, 'wb') as snapshotFile:
+        snapshotFile.write(SNAPSHOT_HEADER.pack(SNAPSHOT_MAGIC, numKeys, size, a, b, p))
+        snapshotFile.write(buckets.tobytes())
+        snapshotFile.write(sortedHashes.tobytes())
+        snapshotFile.write(keyStarts.tobytes())
+        snapshotFile.write(valueStarts.tobytes())
+        snapshotFile.writelines(chunks)
+
+
+
+
+'''
+Read-only hash table backed by a memory-mapped snapshot file. Nothing is
+deserialized when the file is opened. The sections are viewed in place, and
+a lookup only unpickles the keys in its bucket whose cached hash matches, plus
+the value it returns. Many processes can map the same file and share its
+pages through the operating system's page cache.
+'''
+class MappedHashTable:
+
+
+    def __init__(self, path):
+        self.file = open(path, 'rb')
+        self.map = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magic, numKeys, size, a, b, p = SNAPSHOT_HEADER.unpack_from(self.map, 0)
+        if magic != SNAPSHOT_MAGIC:
+            self.close()
+            raise ValueError("Not a hash table snapshot: " + str(path))
+        
+        self.numKeys = numKeys
+        self.size = size
+        self.a = a
+        self.b = b
+        self.p = p
+
+        view = memoryview(self.map)
+        offset = SNAPSHOT_HEADER.size
+        self.buckets, offset = self.__section(view, offset, size + 1)
+        self.hashes, offset = self.__section(view, offset, numKeys)
+        self.keyStarts, offset = self.__section(view, offset, numKeys + 1)
+        self.valueStarts, offset = self.__section(view, offset, numKeys)
+        self.blob = view[offset:]
+    
+
+    # maps count 64-bit integers starting at offset. On big-endian machines
+    # the section has to be copied and byteswapped instead
+    def __section(self, view, offset, count):
+        end = offset + 8*count
+
+        if sys.byteorder == 'little':
+            section = view[offset:end].cast('Q')
+        # array('Q', view) would make one element per byte, so the raw
+        # little endian bytes are copied in and then swapped
+        else:
+            section = array('Q')
+            section.frombytes(view[offset:end])
+            section.byteswap()
+        
+        return section, end
+
+
+    def get(self, key):
+        hashCache = (self.a*stableHash(key) + self.b) % self.p
+        bucket = hashCache % self.size
+        hashes = self.hashes
+
+        for i in range(self.buckets[bucket], self.buckets[bucket + 1]):
+            if hashes[i] == hashCache:
+                valueStart = self.valueStarts[i]
+
+                if pickle.loads(self.blob[self.keyStarts[i]:valueStart]) == key:
+                    return pickle.loads(self.blob[valueStart:self.keyStarts[i + 1]])
+        
+        raise KeyError("Key not in hashtable")
+    
+
+    def __len__(self):
+        return self.numKeys
+    
+
+    def __contains__(self, key):
+        try:
+            self.get(key)
+            return True
+        except KeyError:
+            return False
+    
+
+    def items(self):
+        for i in range(self.numKeys):
+            valueStart = self.valueStarts[i]
+            yield (pickle.loads(self.blob[self.keyStarts[i]:valueStart]), pickle.loads(self.blob[valueStart:self.keyStarts[i + 1]]))
+    
+
+    def keys(self):
+        for i in range(self.numKeys):
+            yield pickle.loads(self.blob[self.keyStarts[i]:self.valueStarts[i]])
     
 
     def values(self):
-        values = []
+        for i in range(self.numKeys):
+            yield pickle.loads(self.blob[self.valueStarts[i]:self.keyStarts[i + 1]])
+    
 
-        for i in range(len(self.table)):
-            if self.table[i] is not None:
-                element = self.table[i]
-                while element is not None:
-                    values.append(element.value)
-                    element = element.chainNext
+    def __iter__(self):
+        return self.keys()
+    
+
+    # the memoryviews have to be released before the map can be closed
+    def close(self):
+        for attribute in ('buckets', 'hashes', 'keyStarts', 'valueStarts', 'blob'):
+            section = getattr(self, attribute, None)
+            if isinstance(section, memoryview):
+                section.release()
         
+        self.map.close()
+        self.file.close()
+    
 
-        return values
+    def __enter__(self):
+        return self
+    
+
+    def __exit__(self, excType, excValue, traceback):
+        self.close()
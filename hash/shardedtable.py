@@ -0,0 +1,194 @@
+'''
+File: shardedtable.py
+Author: Joshua Jacobs-Rebhun
+Date: January 10, 2022
+
+This file implements a hash table that can be shared between threads. Keys
+are spread over a number of independent HashTable shards, each guarded by its
+own lock, so threads working on different shards never wait for each other.
+'''
+
+import threading
+
+from hashtable import HashTable, MASK64
+
+
+# odd constant used to mix hash(key) before taking the shard from its top
+# bits, so the shard choice does not line up with the buckets inside a shard
+SHARD_MIX = 0x9e3779b97f4a7c15
+
+
+'''
+Hash table partitioned into numShards independent HashTable shards. A key's
+shard comes from the high bits of its mixed hash. Every operation on a shard
+holds that shard's lock, so a resize in one shard can never be seen half done
+by a reader, and operations on different shards run without contention.
+
+snapshot() gives lock-free reads in the read-copy-update style. It returns a
+frozen copy of every shard. Readers can use the copy without taking any lock,
+and writers keep updating the live shards. A shard's copy is only rebuilt once
+the shard has changed, so taking repeated snapshots of a mostly idle table is
+cheap. Any other keyword arguments are passed on to the shard constructors.
+'''
+class ShardedHashTable:
+
+
+    # numShards should be a power of 2
+    def __init__(self, numShards=16, **tableOptions):
+
+        if numShards < 1 or numShards & (numShards - 1) != 0:
+            raise ValueError("numShards must be a power of 2.")
+
+        self.numShards = numShards
+        self.shardShift = 64 - (numShards.bit_length() - 1)
+        self.tableOptions = tableOptions
+        self.shards = [HashTable(**tableOptions) for i in range(numShards)]
+        self.locks = [threading.Lock() for i in range(numShards)]
+
+        # every write bumps its shard's version. The last published copy of
+        # each shard is reused by snapshot until the version moves on
+        self.versions = [0] * numShards
+        self.shardCopies = [None] * numShards
+        self.copyVersions = [-1] * numShards
+    
+
+    # picks the shard from the top bits of the mixed hash. With one shard
+    # the shift is 64 and every key lands in shard 0
+    def shardIndex(self, key):
+        return ((hash(key) * SHARD_MIX) & MASK64) >> self.shardShift
+
+
+    def get(self, key):
+        index = self.shardIndex(key)
+
+        with self.locks[index]:
+            return self.shards[index].get(key)
+    
+
+    def add(self, key, value):
+        index = self.shardIndex(key)
+
+        with self.locks[index]:
+            self.shards[index].add(key, value)
+            self.versions[index] += 1
+    
+
+    def delete(self, key):
+        index = self.shardIndex(key)
+
+        with self.locks[index]:
+            value = self.shards[index].delete(key)
+            self.versions[index] += 1
+            return value
+    
+
+    def __contains__(self, key):
+        index = self.shardIndex(key)
+
+        with self.locks[index]:
+            return key in self.shards[index]
+    
+
+    def __len__(self):
+        return sum(len(shard) for shard in self.shards)
+    
+
+    # groups the pairs by shard first so each lock is taken once, and each
+    # shard gets a single presized bulk update
+    def update(self, items):
+
+        if hasattr(items, 'items'):
+            items = items.items()
+        
+        groups = [[] for i in range(self.numShards)]
+        for item in items:
+            groups[self.shardIndex(item[0])].append(item)
+        
+        for index in range(self.numShards):
+            if len(groups[index]) > 0:
+                with self.locks[index]:
+                    self.shards[index].update(groups[index])
+                    self.versions[index] += 1
+    
+
+    # iterates shard by shard. Each shard's items are copied under its lock,
+    # so the iteration is consistent within a shard but not across shards
+    def items(self):
+        for index in range(self.numShards):
+            with self.locks[index]:
+                shardItems = list(self.shards[index].items())
+            
+            for item in shardItems:
+                yield item
+    
+
+    def keys(self):
+        for key, value in self.items():
+            yield key
+    
+
+    def values(self):
+        for key, value in self.items():
+            yield value
+    
+
+    def __iter__(self):
+        return self.keys()
+
+
+    # returns a ShardedSnapshot for lock-free reads
+    def snapshot(self):
+        copies = []
+
+        for index in range(self.numShards):
+            with self.locks[index]:
+                shard = self.shards[index]
+
+                if self.copyVersions[index] != self.versions[index]:
+                    self.shardCopies[index] = HashTable.from_items(list(shard.items()), engine='openaddressing', hashFamily=shard.hashFamily)
+                    self.copyVersions[index] = self.versions[index]
+                
+                copies.append(self.shardCopies[index])
+        
+        return ShardedSnapshot(self, copies)
+
+
+
+
+'''
+Read-only copy of a ShardedHashTable. Its shards are never modified after
+they are published, so any number of threads can read it without locking.
+'''
+class ShardedSnapshot:
+
+
+    def __init__(self, table, shards):
+        self.shardIndex = table.shardIndex
+        self.shards = shards
+    
+
+    def get(self, key):
+        return self.shards[self.shardIndex(key)].get(key)
+    
+
+    def __contains__(self, key):
+        return key in self.shards[self.shardIndex(key)]
+    
+
+    def __len__(self):
+        return sum(len(shard) for shard in self.shards)
+    
+
+    def items(self):
+        for shard in self.shards:
+            for item in shard.items():
+                yield item
+    
+
+    def keys(self):
+        for key, value in self.items():
+            yield key
+    
+
+    def __iter__(self):
+        return self.keys()
@@ -7,8 +7,129 @@ This file defines the heap class with its associated methods and
 also the heapsort algorithm.
 '''
 
+import heapq
 
-class MaxHeap:
+# heapq has C implementations of the max heap operations. Python 3.14 made
+# them public, and older versions have them with a leading underscore. The
+# heaps fall back to their own loops when neither is there
+try:
+    from heapq import heapify_max, heappop_max, heapreplace_max
+except ImportError:
+    try:
+        from heapq import _heapify_max as heapify_max, _heappop_max as heappop_max, _heapreplace_max as heapreplace_max
+    except ImportError:
+        heapify_max = heappop_max = heapreplace_max = None
+
+
+'''
+Handle to an item pushed on a heap that tracks handles. It records the
+item's current index in the heap's array, so increase_key and decrease_key
+find it in O(1). The position is -1 once the item has left the heap.
+'''
+class HeapHandle:
+
+    __slots__ = ('position',)
+
+    def __init__(self, position):
+        self.position = position
+
+
+
+
+'''
+Interface shared by the max priority queues: MaxHeap, DaryHeap and
+PairingHeap. push returns a handle when the queue tracks them, which
+increase_key, decrease_key and itemOf take, and so do pushpop_handle and
+replace_handle for the item they push. The defaults of pushpop, replace and
+extractMax are written in terms of push and pop.
+'''
+class PriorityQueue:
+
+
+    def push(self, item):
+        raise NotImplementedError
+
+    def pop(self):
+        raise NotImplementedError
+
+    def peek(self):
+        raise NotImplementedError
+
+    def __len__(self):
+        raise NotImplementedError
+
+    def increase_key(self, handle, item):
+        raise NotImplementedError
+
+    def decrease_key(self, handle, item):
+        raise NotImplementedError
+
+    def itemOf(self, handle):
+        raise NotImplementedError
+
+
+    def pushpop(self, item):
+        return self.pushpop_handle(item)[0]
+
+
+    def replace(self, item):
+        return self.replace_handle(item)[0]
+
+
+    # pushpop and replace that return (item, handle), where handle is what
+    # push would have returned for the pushed item. pushpop_handle gives None
+    # as the handle when the item is returned straight away
+    def pushpop_handle(self, item):
+
+        if len(self) == 0 or not self.peek() > item:
+            return item, None
+
+        return self.replace_handle(item)
+
+
+    def replace_handle(self, item):
+        heapMax = self.pop()
+        handle = self.push(item)
+
+        return heapMax, handle
+
+
+    def extractMax(self):
+
+        if len(self) == 0:
+            return None
+
+        return self.pop()
+
+
+
+
+'''
+Max heap stored in a flat array, with the children of index i at 2i+1 and
+2i+2. Sifting is iterative: the moving item is held in a local and the items
+it passes are shifted one level, so each level costs one write instead of a
+swap.
+
+With trackHandles=True, push returns a HeapHandle and a parallel array of
+handles is kept in step with the items, which is what increase_key and
+decrease_key need. Without it no handle objects are allocated, and the
+sifts after a pop, replace or build are done by heapq's C max heap functions
+where they exist.
+'''
+class MaxHeap(PriorityQueue):
+
+
+    # the constructor converts the array to a heap in O(n). The caller's
+    # array is copied, not modified
+    def __init__(self, array=None, trackHandles=False):
+        self.array = [] if array is None else list(array)
+        self.handles = None
+
+        if trackHandles:
+            self.handles = [HeapHandle(i) for i in range(len(self.array))]
+
+        self.useHeapq = heappop_max is not None and not trackHandles
+        self.buildMaxHeap()
 
 
     # get the left child index of the current index
@@ -39,147 +160,872 @@ class MaxHeap:
             return self.array[self.rightChildIndex(index)]
     
 
-    # fixes one instance of the max heap property
+    # fixes one instance of the max heap property by sifting the item at
+    # index down until both its children are no greater
     def maxHeapify(self, index):
+        array = self.array
+        handles = self.handles
+        size = len(array)
+        item = array[index]
 
-        # check if there are no children
-        if self.leftChild(index) is None:
-            return
-        
-        # check if there is no right child. If there is a right child
-        # there will be a left child, so no need to check for left child
-        elif self.rightChild(index) is None:
-            if self.leftChild(index) > self.array[index]:
-                temp = self.array[index]
-                self.array[index] = self.leftChild(index)
-                self.array[self.leftChildIndex(index)] = temp
+        if handles is not None:
+            handle = handles[index]
 
-                self.maxHeapify(self.leftChildIndex(index))
+        child = 2*index + 1
+        while child < size:
 
-        
-        # if the left and right child are greater, then take the max of the two
-        elif self.leftChild(index) > self.array[index] and self.rightChild(index) > self.array[index]:
-            
-            heapifyIndex = 0
+            # pick the greater child
+            if child + 1 < size and array[child + 1] > array[child]:
+                child += 1
 
-            if self.leftChild(index) > self.rightChild(index):
-                heapifyIndex = self.leftChildIndex(index)
-            else:
-                heapifyIndex = self.rightChildIndex(index)
-            
-            temp = self.array[index]
-            self.array[index] = self.array[heapifyIndex]
-            self.array[heapifyIndex] = temp
+            if not array[child] > item:
+                break
 
-            self.maxHeapify(heapifyIndex)
-        
+            array[index] = array[child]
+            if handles is not None:
+                handles[index] = handles[child]
+                handles[index].position = index
 
-        # if the left child is greater then use the left child
-        elif self.leftChild(index) > self.array[index]:
-            temp = self.array[index]
-            self.array[index] = self.leftChild(index)
-            self.array[self.leftChildIndex(index)] = temp
-            self.maxHeapify(self.leftChildIndex(index))
+            index = child
+            child = 2*index + 1
 
+        array[index] = item
+        if handles is not None:
+            handles[index] = handle
+            handle.position = index
 
-        # if the right child is greater then use the right child
-        elif self.rightChild(index) > self.array[index]:
-            temp = self.array[index]
-            self.array[index] = self.rightChild(index)
-            self.array[self.rightChildIndex(index)] = temp
-            self.maxHeapify(self.rightChildIndex(index))
 
+    # moves the item at index up until its parent is no smaller
+    def siftUp(self, index):
+        array = self.array
+        handles = self.handles
+        item = array[index]
 
-        # if neither left nor right child are greater, return immediately
-        else:
-            return
+        if handles is not None:
+            handle = handles[index]
+
+        while index > 0:
+            parent = (index - 1) >> 1
+
+            if not item > array[parent]:
+                break
+
+            array[index] = array[parent]
+            if handles is not None:
+                handles[index] = handles[parent]
+                handles[index].position = index
+
+            index = parent
+
+        array[index] = item
+        if handles is not None:
+            handles[index] = handle
+            handle.position = index
 
 
     # builds a max heap from an array
     def buildMaxHeap(self):
+
+        if self.useHeapq:
+            heapify_max(self.array)
+            return
         
-        for i in range(len(self.array)//2, -1, -1):
+        for i in range(len(self.array)//2 - 1, -1, -1):
             self.maxHeapify(i)
     
 
     # gets the max element
     def getMax(self):
         return self.array[0]
-    
 
-    
-    
 
-    # checks the rep invariant of the maxHeap data structure
-    def verifyMaxHeap(self, index):
+    # gets the max element without removing it. Raises IndexError if the
+    # heap is empty
+    def peek(self):
+        return self.array[0]
 
-        # if the left child does not exist, then the right child will also not
-        # exist and in this case the node is a leaf node, so it is a maxHeap
-        # by definition
-        if self.leftChild(index) is None:
-            return True
-        
-        # if the right child does not exist, check the left child for max heap property
-        elif self.rightChild(index) is None:
-            return self.leftChild(index) <= self.array[index]
-        
-        elif self.leftChild(index) > self.array[index] or self.rightChild(index) > self.array[index]:
-            return False
-        
-        else:
-            isLeftSubtreeMaxHeap = self.verifyMaxHeap(self.leftChildIndex(index))
-            isRightSubtreeMaxHeap = self.verifyMaxHeap(self.rightChildIndex(index))
 
-            return isLeftSubtreeMaxHeap and isRightSubtreeMaxHeap
-    
+    def __len__(self):
+        return len(self.array)
+
+
+    # checks the rep invariant of the maxHeap data structure for the subtree
+    # rooted at index
+    def verifyMaxHeap(self, index=0):
+        array = self.array
+        stack = [index]
+
+        while len(stack) > 0:
+            index = stack.pop()
+
+            for child in (2*index + 1, 2*index + 2):
+                if child < len(array):
+                    if array[child] > array[index]:
+                        return False
+
+                    stack.append(child)
+
+        if self.handles is not None:
+            for i in range(len(self.handles)):
+                if self.handles[i].position != i:
+                    return False
+
+        return True
+
+
+    # adds an item in O(log n). Returns its handle if handles are tracked
+    def push(self, item):
+        self.array.append(item)
+        handle = None
+
+        if self.handles is not None:
+            handle = HeapHandle(len(self.handles))
+            self.handles.append(handle)
+
+        self.siftUp(len(self.array) - 1)
+
+        return handle
+
+
+    # removes and returns the max element. Raises IndexError if the heap is
+    # empty
+    def pop(self):
+        array = self.array
+
+        if self.useHeapq:
+            return heappop_max(array)
+
+        last = array.pop()
 
-    # gets the max element and removes it from the heap
+        if self.handles is not None:
+            lastHandle = self.handles.pop()
+
+            if len(array) > 0:
+                self.handles[0].position = -1
+                self.handles[0] = lastHandle
+            else:
+                lastHandle.position = -1
+
+        if len(array) == 0:
+            return last
+
+        heapMax = array[0]
+        array[0] = last
+        self.maxHeapify(0)
+
+        return heapMax
+
+
+    # gets the max element and removes it from the heap, or returns None if
+    # the heap is empty
     def extractMax(self):
         
         # check to see if array is empty
         if len(self.array) == 0:
             return None
 
-        lastIndex = len(self.array)-1
-        heapMax = self.array[0]
-        self.array[0] = self.array[lastIndex]
-        self.array[lastIndex] = heapMax
-        heapMax = self.array.pop(lastIndex)
+        return self.pop()
+
+
+    # pushes the item and then pops the max, in one sift. If the item is at
+    # least the max it is returned straight away. On a heap that tracks
+    # handles, use pushpop_handle to keep the pushed item's handle
+    def pushpop(self, item):
+        array = self.array
+
+        if len(array) == 0 or not array[0] > item:
+            return item
+
+        if self.useHeapq:
+            return heapreplace_max(array, item)
+
+        return self.replace_handle(item)[0]
+
+
+    # pops the max and then pushes the item, in one sift. Unlike pushpop the
+    # returned item may be smaller than the pushed one. Raises IndexError if
+    # the heap is empty. On a heap that tracks handles, use replace_handle to
+    # keep the pushed item's handle
+    def replace(self, item):
+
+        if self.useHeapq:
+            return heapreplace_max(self.array, item)
+
+        return self.replace_handle(item)[0]
+
+
+    def pushpop_handle(self, item):
+        array = self.array
+
+        if len(array) == 0 or not array[0] > item:
+            return item, None
+
+        return self.replace_handle(item)
+
+
+    # the pushed item takes over the root's slot, so it gets a new handle at
+    # position 0 and the old max's handle is retired
+    def replace_handle(self, item):
+        array = self.array
+
+        if self.useHeapq:
+            return heapreplace_max(array, item), None
+
+        heapMax = array[0]
+        array[0] = item
+        handle = None
+
+        if self.handles is not None:
+            self.handles[0].position = -1
+            handle = HeapHandle(0)
+            self.handles[0] = handle
+
         self.maxHeapify(0)
 
-        return heapMax
+        return heapMax, handle
 
 
-    ''' default constructor '''
-    def __init__(self):
-        self.array = []
+    def __checkHandle(self, handle):
+
+        if self.handles is None:
+            raise ValueError("This heap does not track handles.")
+
+        position = handle.position
+        if position < 0 or position >= len(self.handles) or self.handles[position] is not handle:
+            raise ValueError("The handle is not in this heap.")
+
+        return position
 
+
+    # replaces the handle's item with a greater or equal one
+    def increase_key(self, handle, item):
+        position = self.__checkHandle(handle)
+
+        if self.array[position] > item:
+            raise ValueError("The new item is smaller than the current one.")
+
+        self.array[position] = item
+        self.siftUp(position)
+
+
+    # replaces the handle's item with a smaller or equal one
+    def decrease_key(self, handle, item):
+        position = self.__checkHandle(handle)
+
+        if item > self.array[position]:
+            raise ValueError("The new item is greater than the current one.")
+
+        self.array[position] = item
+        self.maxHeapify(position)
+
+
+    # the item a handle refers to
+    def itemOf(self, handle):
+        return self.array[self.__checkHandle(handle)]
     
-    ''' constructor converts array to heap '''
-    def __init__(self, array):
-        self.array = array.copy()
-        self.buildMaxHeap()
 
-        if not self.verifyMaxHeap(0):
-            raise Exception("Could not build heap. Rep invariant violated.")
+
+'''
+Max heap with d children per node, at indices d*i+1 to d*i+d. A wider node
+makes the tree log_d(n) levels high, so pushes and increase_key move items
+fewer levels, at the cost of d-1 comparisons per level when sifting down.
+d=4 is a good choice when pops are frequent. Handles work as in MaxHeap.
+'''
+class DaryHeap(MaxHeap):
+
+
+    def __init__(self, d=4, array=None, trackHandles=False):
+
+        if d < 2:
+            raise ValueError("A d-ary heap needs d of at least 2.")
+
+        self.d = d
+        super().__init__(array, trackHandles)
+        self.useHeapq = False
+
+
+    def maxHeapify(self, index):
+        array = self.array
+        handles = self.handles
+        size = len(array)
+        d = self.d
+        item = array[index]
+
+        if handles is not None:
+            handle = handles[index]
+
+        first = d*index + 1
+        while first < size:
+
+            # pick the greatest child
+            child = first
+            for sibling in range(first + 1, min(first + d, size)):
+                if array[sibling] > array[child]:
+                    child = sibling
+
+            if not array[child] > item:
+                break
+
+            array[index] = array[child]
+            if handles is not None:
+                handles[index] = handles[child]
+                handles[index].position = index
+
+            index = child
+            first = d*index + 1
+
+        array[index] = item
+        if handles is not None:
+            handles[index] = handle
+            handle.position = index
+
+
+    def siftUp(self, index):
+        array = self.array
+        handles = self.handles
+        d = self.d
+        item = array[index]
+
+        if handles is not None:
+            handle = handles[index]
+
+        while index > 0:
+            parent = (index - 1) // d
+
+            if not item > array[parent]:
+                break
+
+            array[index] = array[parent]
+            if handles is not None:
+                handles[index] = handles[parent]
+                handles[index].position = index
+
+            index = parent
+
+        array[index] = item
+        if handles is not None:
+            handles[index] = handle
+            handle.position = index
+
+
+    def buildMaxHeap(self):
+
+        for i in range((len(self.array) - 2) // self.d, -1, -1):
+            self.maxHeapify(i)
+
+
+    def verifyMaxHeap(self, index=0):
+        array = self.array
+
+        for i in range(1, len(array)):
+            if array[i] > array[(i - 1) // self.d]:
+                return False
+
+        if self.handles is not None:
+            for i in range(len(self.handles)):
+                if self.handles[i].position != i:
+                    return False
+
+        return True
+
+
+
+
+'''
+Marks which pairing heap a node belongs to. Melding forwards the token of the
+emptied heap to the token of the heap that took its nodes, so meld stays O(1)
+and a node finds its current heap by following the forward links.
+'''
+class HeapToken:
+
+    __slots__ = ('forward',)
+
+    def __init__(self):
+        self.forward = None
+
+
+# the token a chain of forward links ends at. The links followed are pointed
+# straight at it, so later lookups are short
+def currentToken(token):
+    end = token
+
+    while end.forward is not None:
+        end = end.forward
+
+    while token is not end:
+        token.forward, token = end, token.forward
+
+    return end
+
+
+
+
+'''
+Node of a pairing heap, which is also the handle push returns. child is the
+first child, sibling the next sibling, and prev the previous sibling, or the
+parent for a first child. token identifies the heap the node was pushed on.
+'''
+class PairingNode:
+
+    __slots__ = ('item', 'child', 'sibling', 'prev', 'token')
+
+    def __init__(self, item, token=None):
+        self.item = item
+        self.child = None
+        self.sibling = None
+        self.prev = None
+        self.token = token
+
+
+
+
+'''
+Max pairing heap. push, meld and increase_key are O(1): they link two trees
+by making the smaller root the first child of the greater. pop merges the
+root's children in two passes, pairing them left to right and then linking
+the pairs right to left, which is O(log n) amortized. decrease_key cuts the
+node out, merges its children and links both back in.
+'''
+class PairingHeap(PriorityQueue):
+
+
+    def __init__(self, array=None):
+        self.root = None
+        self.size = 0
+        self.token = HeapToken()
+
+        if array is not None:
+            for item in array:
+                self.push(item)
+
+
+    def __len__(self):
+        return self.size
+
+
+    # links two roots, either of which may be None, and returns the new root
+    def __link(self, first, second):
+
+        if first is None:
+            return second
+        if second is None:
+            return first
+
+        if second.item > first.item:
+            first, second = second, first
+
+        second.sibling = first.child
+        if first.child is not None:
+            first.child.prev = second
+
+        second.prev = first
+        first.child = second
+
+        return first
+
+
+    # merges a list of siblings into one tree with the two pass pairing
+    def __mergePairs(self, first):
+        pairs = []
+
+        while first is not None:
+            second = first.sibling
+            nextFirst = None if second is None else second.sibling
+
+            first.sibling = first.prev = None
+            if second is not None:
+                second.sibling = second.prev = None
+
+            pairs.append(self.__link(first, second))
+            first = nextFirst
+
+        merged = None
+        while len(pairs) > 0:
+            merged = self.__link(pairs.pop(), merged)
+
+        return merged
+
+
+    # detaches a node that is not the root, together with its subtree
+    def __cut(self, node):
+
+        if node.prev.child is node:
+            node.prev.child = node.sibling
+        else:
+            node.prev.sibling = node.sibling
+
+        if node.sibling is not None:
+            node.sibling.prev = node.prev
+
+        node.sibling = node.prev = None
+
+
+    # a handle is valid if it was pushed on this heap, or on one melded into
+    # it, and it has not been popped since
+    def __checkHandle(self, handle):
+
+        if currentToken(handle.token) is not self.token:
+            raise ValueError("The handle is not in this heap.")
+
+        if handle is not self.root and handle.prev is None:
+            raise ValueError("The handle is not in this heap.")
+
+
+    def push(self, item):
+        node = PairingNode(item, self.token)
+        self.root = self.__link(self.root, node)
+        self.size += 1
+
+        return node
+
+
+    def peek(self):
+
+        if self.root is None:
+            raise IndexError("peek from an empty heap")
+
+        return self.root.item
+
+
+    def pop(self):
+        root = self.root
+
+        if root is None:
+            raise IndexError("pop from an empty heap")
+
+        self.root = self.__mergePairs(root.child)
+        self.size -= 1
+        root.child = None
+
+        return root.item
+
+
+    # moves every item of the other pairing heap into this one in O(1),
+    # leaving the other heap empty. Handles from the other heap now refer to
+    # this one
+    def meld(self, other):
+
+        if other is self:
+            raise ValueError("A heap can not be melded with itself.")
+
+        self.root = self.__link(self.root, other.root)
+        self.size += other.size
+
+        other.root = None
+        other.size = 0
+        other.token.forward = self.token
+        other.token = HeapToken()
+
+
+    def itemOf(self, handle):
+        self.__checkHandle(handle)
+        return handle.item
+
+
+    def increase_key(self, handle, item):
+        self.__checkHandle(handle)
+
+        if handle.item > item:
+            raise ValueError("The new item is smaller than the current one.")
+
+        handle.item = item
+
+        if handle is not self.root:
+            self.__cut(handle)
+            self.root = self.__link(self.root, handle)
+
+
+    def decrease_key(self, handle, item):
+        self.__checkHandle(handle)
+
+        if item > handle.item:
+            raise ValueError("The new item is greater than the current one.")
+
+        handle.item = item
+
+        if handle is not self.root:
+            self.__cut(handle)
+            rest = self.root
+        else:
+            rest = None
+
+        children = self.__mergePairs(handle.child)
+        handle.child = None
+
+        self.root = self.__link(self.__link(rest, children), handle)
+
+
+    def verifyMaxHeap(self):
+        count = 0
+        stack = [] if self.root is None else [self.root]
+
+        while len(stack) > 0:
+            node = stack.pop()
+            count += 1
+
+            child = node.child
+            while child is not None:
+                if child.item > node.item:
+                    return False
+
+                stack.append(child)
+                child = child.sibling
+
+        return count == self.size
     
 
 
-def heapSort(array, reverse=False):
+'''
+Heap ordered by key(item), smallest first, or largest first with
+reverse=True. Each item is stored in an entry (sortKey, sequence, item), so
+the key is computed once per push and never on comparisons, and items with
+equal keys come out in the order they were pushed. The items themselves are
+never compared.
+
+The min heap runs on heapq directly and the max heap on a MaxHeap of entries,
+whose sequence numbers count down so that earlier entries still win ties.
+'''
+class Heap:
+
+
+    def __init__(self, array=None, key=None, reverse=False):
+        self.key = key
+        self.reverse = reverse
+        self.sequence = 0
+
+        entries = [] if array is None else [self.__entry(item) for item in array]
 
-    sortHeap = MaxHeap(array)
-    sortedArray = []
-    heapMax = sortHeap.extractMax()
-    while heapMax is not None:
-        
-        # if sort list in reverse, just append
         if reverse:
-            sortedArray.append(heapMax)
-        
-        # otherwise, append at the beginning
+            self.queue = MaxHeap(entries)
         else:
-            sortedArray.insert(0, heapMax)
-        
-        heapMax = sortHeap.extractMax()
+            heapq.heapify(entries)
+            self.queue = entries
+
+
+    def __entry(self, item):
+        sortKey = item if self.key is None else self.key(item)
+        self.sequence += 1
+
+        if self.reverse:
+            return (sortKey, -self.sequence, item)
+
+        return (sortKey, self.sequence, item)
+
+
+    def __len__(self):
+        return len(self.queue)
+
+
+    def push(self, item):
+
+        if self.reverse:
+            self.queue.push(self.__entry(item))
+        else:
+            heapq.heappush(self.queue, self.__entry(item))
+
+
+    # removes and returns the first item. Raises IndexError if the heap is
+    # empty
+    def pop(self):
+
+        if self.reverse:
+            return self.queue.pop()[2]
+
+        return heapq.heappop(self.queue)[2]
+
+
+    # the first item, without removing it
+    def peek(self):
+
+        if self.reverse:
+            return self.queue.peek()[2]
+
+        return self.queue[0][2]
+
+
+    # pushes the item and then pops the first one. An item that ties with the
+    # first one comes out after it, as it was pushed later
+    def pushpop(self, item):
+
+        if self.reverse:
+            return self.queue.pushpop(self.__entry(item))[2]
+
+        return heapq.heappushpop(self.queue, self.__entry(item))[2]
+
+
+    # pops the first item and then pushes the given one
+    def replace(self, item):
+
+        if self.reverse:
+            return self.queue.replace(self.__entry(item))[2]
+
+        return heapq.heapreplace(self.queue, self.__entry(item))[2]
     
-    return sortedArray
+
+
+# sifts array[index] down within the max heap array[:size]. If items is
+# given, array holds the keys of the items and items is kept in step
+def boundedSiftDown(array, index, size, items=None):
+    item = array[index]
+
+    if items is not None:
+        payload = items[index]
+
+    child = 2*index + 1
+    while child < size:
+
+        if child + 1 < size and array[child + 1] > array[child]:
+            child += 1
+
+        if not array[child] > item:
+            break
+
+        array[index] = array[child]
+        if items is not None:
+            items[index] = items[child]
+
+        index = child
+        child = 2*index + 1
+
+    array[index] = item
+    if items is not None:
+        items[index] = payload
+
+
+'''
+Sorts the caller's list in place with O(1) extra memory, or O(n) for the keys
+when key is given. The list is made a max heap, then the max is repeatedly
+swapped to the end of the heap and the heap boundary moves down by one. A
+descending sort reverses the ascending result. Unlike heapSort with a key,
+the in-place sort is not stable.
+'''
+def heapSortInPlace(array, reverse=False, key=None):
+
+    # the heap is built over the keys, with the items following them
+    sortKeys = array
+    items = None
+
+    if key is not None:
+        sortKeys = [key(item) for item in array]
+        items = array
+
+    size = len(array)
+
+    for i in range(size//2 - 1, -1, -1):
+        boundedSiftDown(sortKeys, i, size, items)
+
+    for end in range(size - 1, 0, -1):
+        sortKeys[0], sortKeys[end] = sortKeys[end], sortKeys[0]
+        if items is not None:
+            items[0], items[end] = items[end], items[0]
+
+        boundedSiftDown(sortKeys, 0, end, items)
+
+    if reverse:
+        array.reverse()
+
+    return array
+
+
+'''
+Returns a sorted copy of the array, in ascending order or descending with
+reverse=True. The result is written into a preallocated list, or into output
+if one of at least len(array) slots is given, instead of being grown or
+shifted item by item. With a key function the sort is stable, as the Heap
+breaks ties by input order.
+'''
+def heapSort(array, reverse=False, key=None, output=None):
+    size = len(array)
+
+    if output is None:
+        output = [None] * size
+    elif len(output) < size:
+        raise ValueError("The output list is shorter than the array.")
+
+    if key is not None:
+        sortHeap = Heap(array, key=key, reverse=reverse)
+
+        for i in range(size):
+            output[i] = sortHeap.pop()
+
+        return output
+
+    # the max comes out first, so an ascending sort fills from the back
+    sortHeap = MaxHeap(array)
+
+    if reverse:
+        for i in range(size):
+            output[i] = sortHeap.pop()
+    else:
+        for i in range(size - 1, -1, -1):
+            output[i] = sortHeap.pop()
+
+    return output
+
+
+'''
+Returns the k largest items of the iterable by key, largest first, in one
+pass with O(k) memory. A min heap of the best k entries is kept, and an item
+replaces its root only if it beats it. Entries are (sortKey, -index, item)
+like the entries of Heap, with the index negated so that among equal keys the
+latest item is dropped first and ties come out in input order.
+'''
+def top_k(iterable, k, key=None):
+
+    if k <= 0:
+        return []
+
+    entries = []
+    index = 0
+
+    for item in iterable:
+        sortKey = item if key is None else key(item)
+
+        if len(entries) < k:
+            heapq.heappush(entries, (sortKey, -index, item))
+        elif entries[0][0] < sortKey:
+            heapq.heapreplace(entries, (sortKey, -index, item))
+
+        index += 1
+
+    entries.sort(reverse=True)
+
+    return [entry[2] for entry in entries]
+
+
+'''
+Lazily merges iterables that are each sorted by key into one sorted stream.
+Only the current item of each iterable is held, in a min heap of entries
+[sortKey, run, item, iterator]. Entries are reused when their iterable
+advances, and equal keys come out in the order of the iterables they came
+from. When one iterable is left, the rest of it is yielded directly.
+'''
+def kmerge(*iterables, key=None):
+    entries = []
+
+    for run in range(len(iterables)):
+        iterator = iter(iterables[run])
+
+        for item in iterator:
+            entries.append([item if key is None else key(item), run, item, iterator])
+            break
+
+    heapq.heapify(entries)
+
+    while len(entries) > 1:
+        entry = entries[0]
+        yield entry[2]
+
+        try:
+            item = next(entry[3])
+        except StopIteration:
+            heapq.heappop(entries)
+            continue
+
+        entry[0] = item if key is None else key(item)
+        entry[2] = item
+        heapq.heapreplace(entries, entry)
+
+    if len(entries) == 1:
+        yield entries[0][2]
+        yield from entries[0][3]
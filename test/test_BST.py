@@ -8,12 +8,16 @@ Test file for the BST implementation
 
 import os
 import sys
+import time
+import random
+import tracemalloc
 
 current_dir = os.path.dirname(__file__)
 test_file_dir = os.path.join(current_dir, '..', 'tree')
 sys.path.append(test_file_dir)
 
-from BST import BinarySearchTree, BSTSort, buildBST
+from BST import BinarySearchTree, BSTSort, buildBST, Node, NodePool, PooledBinarySearchTree, CHECK_REP_ENV
+from BST import AVLTree, SortedMap
 
 
 
@@ -23,6 +27,470 @@ def test_BST_sort(list):
     return sortedList
 
 
+'''
+Checks the pooled tree against a sorted list through random inserts and
+deletes, including duplicate values
+'''
+def testPooledTree():
+
+    myTree = PooledBinarySearchTree()
+    expected = []
+
+    for i in range(2000):
+        value = random.randint(0, 300)
+
+        if value in expected and random.random() < 0.4:
+            assert myTree.delete(value) == value
+            expected.remove(value)
+        else:
+            myTree.insert(value)
+            expected.append(value)
+    
+    expected.sort()
+    inorder = []
+    myTree.traverse(lambda node: inorder.append(node.value))
+    assert inorder == expected
+
+    assert myTree.min() == expected[0] and myTree.max() == expected[-1]
+    assert myTree.get(expected[5]).value == expected[5]
+    assert myTree.get(-1) is None and myTree.getNode(expected[5]).value == expected[5]
+
+    distinct = sorted(set(expected))
+    distinctTree = PooledBinarySearchTree()
+    for value in random.sample(distinct, len(distinct)):
+        distinctTree.insert(value)
+    
+    for i in range(1, len(distinct) - 1):
+        assert distinctTree.getOneLarger(distinct[i]) == distinct[i + 1]
+        assert distinctTree.getOneSmaller(distinct[i]) == distinct[i - 1]
+    assert distinctTree.getOneLarger(distinct[-1]) is None
+    assert distinctTree.getOneSmaller(distinct[0]) is None
+
+    # a degenerate tree is walked without recursion
+    deepTree = PooledBinarySearchTree()
+    for i in range(5000):
+        deepTree.insert(i)
+    count = []
+    deepTree.traverse(count.append, 'postorder')
+    assert len(count) == 5000
+
+
+'''
+Rep invariant checks are off by default, can be sampled, and catch a
+corrupted tree
+'''
+def testCheckRep():
+
+    values = random.sample(range(100000), 20000)
+
+    start = time.perf_counter()
+    myTree = buildBST(values)
+    for value in values[:10000]:
+        myTree.delete(value)
+    assert time.perf_counter() - start < 5
+    assert myTree.checkEvery == 0
+
+    checkedTree = BinarySearchTree(checkRep=True, checkEvery=10)
+    for value in values[:200]:
+        checkedTree.insert(value)
+    assert checkedTree.numOperations == 200
+
+    # break the ordering behind the tree's back
+    checkedTree.max(returnNode=True).value = -1
+    try:
+        for value in range(10):
+            checkedTree.insert(100001)
+        assert False
+    except Exception as error:
+        assert "Rep invariant" in str(error)
+
+    os.environ[CHECK_REP_ENV] = '3'
+    try:
+        assert BinarySearchTree().checkEvery == 3
+        assert BinarySearchTree(checkRep=False).checkEvery == 0
+    finally:
+        del os.environ[CHECK_REP_ENV]
+
+    # deleting the last value leaves an empty tree, which is valid
+    checkedTree = BinarySearchTree(checkRep=True)
+    checkedTree.insert(1)
+    checkedTree.delete(1)
+    assert checkedTree.root is None
+
+
+'''
+Random inserts and deletes, duplicates included, keep the AVL tree ordered
+and balanced, and sorted input gives a logarithmic height
+'''
+def testAVLTree():
+
+    myTree = AVLTree(checkRep=True)
+    expected = []
+
+    for i in range(3000):
+        value = random.randint(0, 500)
+
+        if value in expected and random.random() < 0.45:
+            assert myTree.delete(value) == value
+            expected.remove(value)
+        else:
+            myTree.insert(value)
+            expected.append(value)
+
+        if i % 100 == 0:
+            assert myTree.isBalanced()
+
+    assert myTree.isBalanced()
+    assert myTree.min() == min(expected) and myTree.max() == max(expected)
+
+    inorder = []
+    myTree.traverse(lambda node: inorder.append(node.value))
+    assert inorder == sorted(expected)
+
+    sortedTree = AVLTree()
+    for i in range(100000):
+        sortedTree.insert(i)
+
+    assert sortedTree.root.height <= 18 and sortedTree.isBalanced()
+    assert sortedTree.get(99999).value == 99999 and sortedTree.get(100000) is None
+    assert sortedTree.getOneSmaller(5000) == 4999
+
+    for i in range(0, 100000, 2):
+        sortedTree.delete(i)
+    assert sortedTree.isBalanced() and sortedTree.min() == 1
+
+
+'''
+The generators agree with each other and with a sorted list, work on empty
+and degenerate trees, and a Morris walk that stops early leaves no threads
+behind
+'''
+def testTraversals():
+
+    emptyTree = BinarySearchTree()
+    emptyTree.traverse()
+    emptyTree.traverse(morris=True)
+    assert list(emptyTree) == []
+    assert list(emptyTree.iter_preorder()) == [] and list(emptyTree.iter_postorder()) == []
+
+    values = [random.randint(0, 200) for i in range(500)]
+    myTree = buildBST(values)
+
+    assert list(myTree) == sorted(values)
+    morrisValues = []
+    myTree.traverse(lambda node: morrisValues.append(node.value), morris=True)
+    assert morrisValues == sorted(values)
+
+    for order, walk in [('preorder', myTree.iter_preorder), ('postorder', myTree.iter_postorder)]:
+        visited = []
+        myTree.traverse(lambda node: visited.append(node.value), order)
+        assert list(walk()) == visited and sorted(visited) == sorted(values)
+
+    # a node comes before its children in pre-order and after them in post-order
+    preorder = list(myTree.iter_preorder(nodes=True))
+    postorder = list(myTree.iter_postorder(nodes=True))
+    assert preorder[0] is myTree.root and postorder[-1] is myTree.root
+
+    # stopping a Morris walk early, here by raising from nodeFunction,
+    # removes the threads, so other walks and range queries still terminate
+    smallTree = BinarySearchTree.from_sorted([10, 20, 30, 40, 50, 60, 70])
+    visited = []
+
+    def stopAfterTwo(node):
+        visited.append(node.value)
+        if len(visited) == 2:
+            raise StopIteration
+
+    try:
+        smallTree.traverse(stopAfterTwo, morris=True)
+        assert False
+    except StopIteration:
+        pass
+
+    assert visited == [10, 20]
+    assert list(smallTree) == [10, 20, 30, 40, 50, 60, 70]
+    assert list(smallTree.range(0, 60)) == [10, 20, 30, 40, 50, 60]
+    assert all(node.rightChild is None or node.rightChild.parent is node for node in smallTree.iter_preorder(nodes=True))
+
+    try:
+        smallTree.traverse(print, 'preorder', morris=True)
+        assert False
+    except Exception as error:
+        assert "Morris" in str(error)
+
+    deepTree = BinarySearchTree()
+    for i in range(5000):
+        deepTree.insert(i)
+
+    assert sum(1 for value in deepTree.iter_postorder()) == 5000
+    morrisValues = []
+    deepTree.traverse(lambda node: morrisValues.append(node.value), morris=True)
+    assert morrisValues == list(range(5000))
+
+
+'''
+select, rank, count_range and percentile agree with a sorted list through
+inserts and deletes, on plain and AVL trees
+'''
+def testOrderStatistics():
+
+    for treeType in (BinarySearchTree, AVLTree):
+        myTree = treeType(orderStatistics=True, checkRep=True, checkEvery=50)
+        expected = []
+
+        for i in range(2000):
+            value = random.randint(0, 300)
+
+            if value in expected and random.random() < 0.4:
+                myTree.delete(value)
+                expected.remove(value)
+            else:
+                myTree.insert(value)
+                expected.append(value)
+
+        expected.sort()
+        assert len(myTree) == len(expected)
+
+        for k in range(0, len(expected), 7):
+            assert myTree.select(k) == expected[k]
+        assert myTree.select(-1) == expected[-1]
+
+        for value in range(-1, 302, 5):
+            assert myTree.rank(value) == sum(1 for v in expected if v < value)
+
+        for lo, hi in [(0, 300), (50, 60), (100, 100), (60, 50), (-5, -1)]:
+            assert myTree.count_range(lo, hi) == sum(1 for v in expected if lo <= v <= hi)
+
+        assert myTree.percentile(0) == expected[0] and myTree.percentile(100) == expected[-1]
+        assert myTree.percentile(50) == expected[(len(expected) + 1) // 2 - 1]
+
+        try:
+            myTree.select(len(expected))
+            assert False
+        except IndexError:
+            pass
+
+    try:
+        BinarySearchTree().rank(1)
+        assert False
+    except Exception as error:
+        assert "orderStatistics" in str(error)
+
+
+'''
+range walks the values between two bounds, floor and ceiling find the
+nearest values, and getOneLarger and getOneSmaller skip duplicates
+'''
+def testRangeQueries():
+
+    for treeType in (BinarySearchTree, AVLTree):
+        values = [random.randrange(0, 1000, 3) for i in range(600)]
+        myTree = treeType()
+        for value in values:
+            myTree.insert(value)
+
+        values.sort()
+
+        for lo, hi in [(None, None), (100, 200), (99, 201), (300, 300), (500, 400), (None, 50), (950, None)]:
+            for inclusive in (True, False, (True, False), (False, True)):
+                low, high = inclusive if isinstance(inclusive, tuple) else (inclusive, inclusive)
+                expected = [v for v in values if (lo is None or v > lo or (low and v == lo)) and (hi is None or v < hi or (high and v == hi))]
+
+                assert list(myTree.range(lo, hi, inclusive)) == expected
+
+        # the walk is lazy and stops early
+        walk = myTree.range(0)
+        assert [next(walk) for i in range(5)] == values[:5]
+        assert all(isinstance(node, Node) for node in myTree.range(100, 120, nodes=True))
+
+        for value in range(-3, 1003, 7):
+            below = [v for v in values if v <= value]
+            above = [v for v in values if v >= value]
+            assert myTree.floor(value) == (below[-1] if below else None)
+            assert myTree.ceiling(value) == (above[0] if above else None)
+
+        distinct = sorted(set(values))
+        for i in range(len(distinct)):
+            assert myTree.getOneLarger(distinct[i]) == (distinct[i + 1] if i + 1 < len(distinct) else None)
+            assert myTree.getOneSmaller(distinct[i]) == (distinct[i - 1] if i > 0 else None)
+
+        try:
+            myTree.getOneLarger(1)
+            assert False
+        except Exception as error:
+            assert "not in tree" in str(error)
+
+
+'''
+Bulk loading builds a balanced tree with correct parent pointers and node
+fields, and BSTSort handles sorted input
+'''
+def testBulkLoad():
+
+    for size in [0, 1, 2, 7, 1000]:
+        values = sorted(random.randint(0, 50) for i in range(size))
+
+        myTree = BinarySearchTree.from_sorted(values, checkRep=True)
+        assert list(myTree) == values
+
+        avlTree = AVLTree.from_iterable(reversed(values), orderStatistics=True, checkRep=True)
+        assert list(avlTree) == values and avlTree.isBalanced() and len(avlTree) == size
+
+        # the bulk loaded trees take further inserts and deletes
+        avlTree.insert(25)
+        if size > 0:
+            avlTree.delete(values[0])
+        assert avlTree.isBalanced()
+
+    myTree = BinarySearchTree.from_sorted(range(100000))
+    depth = max(sum(1 for ancestor in iterAncestors(node)) for node in myTree.range(0, 100, nodes=True))
+    assert depth <= 17
+
+    try:
+        BinarySearchTree.from_sorted([1, 3, 2])
+        assert False
+    except ValueError:
+        pass
+
+    values = [random.random() for i in range(1000)]
+    assert BSTSort(values) == sorted(values)
+    assert BSTSort(list(range(50000))) == list(range(50000))
+    assert list(buildBST(values)) == sorted(values)
+
+
+def iterAncestors(node):
+    while node.parent is not None:
+        node = node.parent
+        yield node
+
+
+def benchmarkBulkLoad():
+
+    values = [random.random() for i in range(1000000)]
+
+    start = time.perf_counter()
+    BinarySearchTree.from_iterable(values)
+    print("from_iterable, 1M values: " + str(round(time.perf_counter() - start, 2)) + " s")
+
+    start = time.perf_counter()
+    BSTSort(values[:200000])
+    print("BSTSort, 200k values: " + str(round(time.perf_counter() - start, 2)) + " s")
+
+
+'''
+SortedMap behaves like a dict kept in key order, counts repeated keys, and
+orders records through a key function without comparing the records
+'''
+def testSortedMap():
+
+    myMap = SortedMap(checkRep=True)
+    expected = {}
+
+    for i in range(2000):
+        key = random.randint(0, 300)
+
+        if key in expected and random.random() < 0.3:
+            assert myMap.pop(key) == expected.pop(key)
+        else:
+            myMap[key] = str(key) + "-" + str(i)
+            expected[key] = str(key) + "-" + str(i)
+
+    assert len(myMap) == len(expected) and myMap.isBalanced()
+    assert list(myMap) == sorted(expected)
+    assert list(myMap.items()) == sorted(expected.items())
+    assert list(myMap.values()) == [expected[key] for key in sorted(expected)]
+    assert list(reversed(myMap.keys())) == sorted(expected, reverse=True)
+
+    missing = next(key for key in range(301) if key not in expected)
+    assert missing not in myMap and myMap.pop(missing, None) is None
+
+    # get returns payloads like dict.get, and getNode finds the node
+    present = min(expected)
+    assert myMap.get(present) == expected[present] and myMap.getNode(present).payload == expected[present]
+    assert myMap.get(missing) is None and myMap.get(missing, "none") == "none" and myMap.getNode(missing) is None
+    try:
+        myMap[missing]
+        assert False
+    except KeyError:
+        pass
+
+    # repeated keys are counted in one node
+    counts = SortedMap()
+    for word in "the cat and the hat and the bat".split():
+        counts.insert(word)
+
+    assert counts.count("the") == 3 and counts.count("dog") == 0 and len(counts) == 5
+    counts.delete("the")
+    assert counts.count("the") == 2
+    counts.delete("cat")
+    assert "cat" not in counts and list(counts) == ["and", "bat", "hat", "the"]
+
+    records = [{'time': random.random(), 'id': i} for i in range(200)]
+    byTime = SortedMap(((record, record['id']) for record in records), key=lambda record: record['time'])
+    assert [record['id'] for record in byTime] == [record['id'] for record in sorted(records, key=lambda record: record['time'])]
+    assert byTime[records[7]] == 7 and byTime.get(records[7]) == 7
+    assert byTime.getNode(records[7]['time']).key is records[7]
+
+    # inherited range queries work on the sort keys
+    middle = sorted(record['time'] for record in records)[100]
+    assert len(list(byTime.range(None, middle, (True, False)))) == 100
+
+    loaded = SortedMap.from_iterable([(3, 'c'), (1, 'a'), (2, 'b'), (1, 'z')], orderStatistics=True, checkRep=True)
+    assert list(loaded.items()) == [(1, 'z'), (2, 'b'), (3, 'c')] and loaded.select(1) == 2
+    loaded[0] = 'zero'
+    del loaded[2]
+    assert list(loaded.items()) == [(0, 'zero'), (1, 'z'), (3, 'c')] and loaded.rank(3) == 2
+
+
+'''
+Time per insert on sorted input. The AVL tree stays flat as the tree grows,
+while the plain tree degrades into a linked list
+'''
+def benchmarkSortedInsert():
+
+    for treeType, sizes in [(AVLTree, [1000, 10000, 100000]), (BinarySearchTree, [1000, 2000, 4000])]:
+        for size in sizes:
+            myTree = treeType()
+
+            start = time.perf_counter()
+            for i in range(size):
+                myTree.insert(i)
+            elapsed = time.perf_counter() - start
+
+            print(treeType.__name__ + ", " + str(size) + " sorted inserts: " + str(round(elapsed / size * 1e6, 2)) + " us per insert")
+
+
+'''
+Bytes per node for slotted Node objects, for the same class without slots,
+and for the NodePool columns
+'''
+def benchmarkNodeMemory(numNodes=100000):
+
+    class DictNode:
+        def __init__(self, value=None, parent=None, leftChild=None, rightChild=None):
+            self.leftChild = leftChild
+            self.rightChild = rightChild
+            self.parent = parent
+            self.value = value
+    
+    for name, nodeClass in [("Node without slots", DictNode), ("Node with slots", Node)]:
+        tracemalloc.start()
+        nodes = [nodeClass(i) for i in range(numNodes)]
+        memory = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+
+        print(name + ": " + str(memory / numNodes) + " bytes/node")
+    
+    tracemalloc.start()
+    pool = NodePool()
+    for i in range(numNodes):
+        pool.allocate(i)
+    memory = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+
+    print("NodePool: " + str(memory / numNodes) + " bytes/node")
+
+
 if __name__ == "__main__":
     
     testList = [3, 6, 5, 4, 1, 9, 8, 7, 6, 5, 3, 2, 1]
@@ -47,4 +515,16 @@ if __name__ == "__main__":
 
     sortedList = test_BST_sort(testList)
 
-    print(sortedList)
\ No newline at end of file
+    print(sortedList)
+
+    testPooledTree()
+    testCheckRep()
+    testAVLTree()
+    testTraversals()
+    testOrderStatistics()
+    testRangeQueries()
+    testBulkLoad()
+    testSortedMap()
+    benchmarkNodeMemory()
+    benchmarkSortedInsert()
+    benchmarkBulkLoad()
@@ -0,0 +1,153 @@
+'''
+File: test_cache.py
+Author: Joshua Jacobs-Rebhun
+Date: January 11, 2022
+
+This is the test file for the caches built on the hashtable
+'''
+
+
+import os
+import sys
+
+current_dir = os.path.dirname(__file__)
+test_file_dir = os.path.join(current_dir, "..", "hash")
+sys.path.append(test_file_dir)
+
+from cache import LRUCache, LFUCache, TTLCache, memoize
+
+
+def testLRU():
+
+    myCache = LRUCache(maxEntries=3)
+
+    for key in "abc":
+        myCache.add(key, key.upper())
+    
+    assert myCache.get("a") == "A"
+    myCache.add("d", "D")
+
+    assert "b" not in myCache
+    assert "a" in myCache and "c" in myCache and "d" in myCache
+    assert myCache.evictions == 1
+
+    try:
+        myCache.get("b")
+        assert False
+    except KeyError:
+        pass
+    
+    assert myCache.hits == 1 and myCache.misses == 1
+    assert myCache.delete("c") == "C" and len(myCache) == 2
+
+
+def testLFU():
+
+    myCache = LFUCache(maxEntries=3)
+
+    for key in "abc":
+        myCache.add(key, key)
+    
+    for i in range(3):
+        myCache.get("a")
+    myCache.get("b")
+
+    # c has been used least, then b, so they go in that order
+    myCache.add("d", "d")
+    assert "c" not in myCache
+
+    myCache.get("d")
+    myCache.get("d")
+    myCache.add("e", "e")
+    assert "b" not in myCache
+    assert sorted(myCache.table.keys()) == ["a", "d", "e"]
+
+    myCache.delete("e")
+    myCache.add("f", "f")
+    myCache.add("g", "g")
+    assert "f" not in myCache and "a" in myCache
+
+
+def testTTL():
+
+    now = [0.0]
+    myCache = TTLCache(ttl=10, clock=lambda: now[0])
+
+    myCache.add("short", 1, ttl=1)
+    myCache.add("long", 2)
+
+    now[0] = 5.0
+    assert "short" not in myCache
+
+    try:
+        myCache.get("short")
+        assert False
+    except KeyError:
+        pass
+    
+    assert myCache.get("long") == 2 and myCache.expirations == 1 and len(myCache) == 1
+
+    now[0] = 20.0
+    assert "long" not in myCache
+
+
+def testByteLimit():
+
+    myCache = LRUCache(maxBytes=1000, sizeOf=lambda key, value: len(value))
+
+    for i in range(10):
+        myCache.add(i, "x" * 300)
+    
+    assert len(myCache) == 3 and myCache.numBytes == 900
+
+    myCache.add(9, "x" * 10)
+    assert myCache.numBytes == 610
+
+    # an entry that could never fit is refused without evicting anything
+    try:
+        myCache.add(10, "x" * 1001)
+        assert False
+    except ValueError:
+        pass
+
+    assert len(myCache) == 3 and myCache.numBytes == 610 and 10 not in myCache
+
+    myCache = LRUCache(maxBytes=200)
+
+    try:
+        myCache.add(1, "x" * 1000)
+        assert False
+    except ValueError:
+        pass
+
+    assert len(myCache) == 0 and myCache.numBytes == 0
+
+
+def testMemoize():
+
+    calls = []
+
+    @memoize(LRUCache(maxEntries=100))
+    def square(x):
+        calls.append(x)
+        return x * x
+    
+    for i in range(5):
+        assert square(3) == 9
+    
+    assert calls == [3] and square.cache.hits == 4
+
+    @memoize(LRUCache(maxBytes=200))
+    def repeat(n):
+        return "x" * n
+
+    assert repeat(1000) == "x" * 1000 and len(repeat.cache) == 0
+
+
+if __name__ == "__main__":
+
+    testLRU()
+    testLFU()
+    testTTL()
+    testByteLimit()
+    testMemoize()
@@ -0,0 +1,185 @@
+'''
+File: test_hashset.py
+Author: Joshua Jacobs-Rebhun
+Date: January 11, 2022
+
+This is the test file for the hash set
+'''
+
+
+import os
+import sys
+import time
+import random
+
+current_dir = os.path.dirname(__file__)
+test_file_dir = os.path.join(current_dir, "..", "hash")
+sys.path.append(test_file_dir)
+
+from hashset import HashSet
+from hashtable import HashTable, MultiplyShiftHashFamily, ResizePolicy
+
+
+def testBasicOperations():
+
+    mySet = HashSet()
+
+    for i in range(1000):
+        mySet.add(i % 300)
+
+    assert len(mySet) == 300
+    assert 299 in mySet and 300 not in mySet
+    assert sorted(mySet) == list(range(300))
+
+    for i in range(0, 300, 2):
+        mySet.discard(i)
+
+    mySet.discard(12345)
+    assert len(mySet) == 150 and 4 not in mySet and 5 in mySet
+
+    for i in range(21, 300, 2):
+        mySet.discard(i)
+
+    assert len(mySet) == 10 and mySet.size < 512
+
+    # the open addressing policy checks apply to sets too, so a set churning
+    # around one size does not keep doubling and halving
+    try:
+        HashSet(resizePolicy=ResizePolicy(growAt=0.75, shrinkAt=0.3))
+        assert False
+    except ValueError:
+        pass
+
+    churnSet = HashSet.from_iterable(range(100))
+    sizeChanges = 0
+
+    for i in range(5000):
+        size = churnSet.size
+        churnSet.discard(i)
+        churnSet.add(i + 100)
+        sizeChanges += churnSet.size != size
+
+    assert sizeChanges <= 2 and len(churnSet) == 100
+
+    try:
+        mySet.remove(4)
+        assert False
+    except KeyError:
+        pass
+
+    mySet.remove(5)
+    assert 5 not in mySet and len(mySet) == 9
+
+
+def testFromIterable():
+
+    mySet = HashSet.from_iterable(str(i) for i in range(500))
+    assert len(mySet) == 500 and "499" in mySet and "500" not in mySet
+
+    mySet = HashSet.from_iterable([1, 1, 2, 3, 3], hashFamily=MultiplyShiftHashFamily())
+    assert sorted(mySet) == [1, 2, 3]
+
+
+def testSetAlgebra():
+
+    evens = range(0, 1000, 2)
+    threes = range(0, 1000, 3)
+
+    # HashSet, built-in set, HashTable and plain iterables as the other operand
+    others = [
+        lambda keys: HashSet.from_iterable(keys),
+        lambda keys: HashSet.from_iterable(keys, hashFamily=MultiplyShiftHashFamily()),
+        lambda keys: set(keys),
+        lambda keys: HashTable.from_items((key, None) for key in keys),
+        lambda keys: iter(keys)
+    ]
+
+    for makeOther in others:
+        for first, second in [(evens, threes), (threes, evens)]:
+
+            mySet = HashSet.from_iterable(first)
+            mySet |= makeOther(second)
+            assert sorted(mySet) == sorted(set(first) | set(second))
+
+            mySet = HashSet.from_iterable(first)
+            mySet &= makeOther(second)
+            assert sorted(mySet) == sorted(set(first) & set(second))
+
+            mySet = HashSet.from_iterable(first)
+            mySet -= makeOther(second)
+            assert sorted(mySet) == sorted(set(first) - set(second))
+
+    # a list is never probed with in, which would scan it once per key
+    class CountingList(list):
+        def __contains__(self, key):
+            raise AssertionError("list operand was scanned")
+
+    for first, second in [(evens, threes), (threes, evens)]:
+        mySet = HashSet.from_iterable(first)
+        mySet &= CountingList(second)
+        assert sorted(mySet) == sorted(set(first) & set(second))
+
+        mySet = HashSet.from_iterable(range(10))
+        mySet -= CountingList(second)
+        assert sorted(mySet) == sorted(set(range(10)) - set(second))
+
+    mySet = HashSet.from_iterable(range(10))
+    mySet &= mySet
+    assert len(mySet) == 10
+
+    mySet -= mySet
+    assert len(mySet) == 0 and list(mySet) == []
+
+
+def testConcurrentModification():
+
+    mySet = HashSet.from_iterable(range(10))
+
+    try:
+        for key in mySet:
+            mySet.add(key + 100)
+        assert False
+    except RuntimeError:
+        pass
+
+    # re-adding a member changes nothing, even at the grow limit, so the
+    # iteration carries on over the same keys
+    mySet = HashSet()
+    for i in range(12):
+        mySet.add(i)
+    size = mySet.size
+    seen = []
+
+    for key in mySet:
+        seen.append(key)
+        mySet.add(0)
+
+    assert sorted(seen) == list(range(12)) and mySet.size == size
+
+
+# intersecting a small set with a large one should cost about the same
+# whichever side the small set is on
+def benchmarkIntersection():
+
+    large = list(range(1000000))
+    small = random.sample(large, 1000)
+
+    for name, left, right in [("small &= large", small, large), ("large &= small", large, small)]:
+        leftSet = HashSet.from_iterable(left)
+        rightSet = HashSet.from_iterable(right)
+
+        start = time.perf_counter()
+        leftSet &= rightSet
+        elapsed = time.perf_counter() - start
+
+        assert len(leftSet) == 1000
+        print(name + ": " + str(round(elapsed * 1000, 2)) + " ms")
+
+
+if __name__ == "__main__":
+
+    testBasicOperations()
+    testFromIterable()
+    testSetAlgebra()
+    testConcurrentModification()
+    benchmarkIntersection()
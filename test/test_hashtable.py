@@ -10,12 +10,495 @@ This is the test file for the hashtable implementation
 
 import os
 import sys
+import time
+import random
+import tracemalloc
+import tempfile
+import json
+import subprocess
+from decimal import Decimal
+from fractions import Fraction
 
 current_dir = os.path.dirname(__file__)
 test_file_dir = os.path.join(current_dir, "..", "hash")
 sys.path.append(test_file_dir)
 
-from hashtable import HashTable
+from hashtable import HashTable, OpenAddressingHashTable, ResizePolicy, MappedHashTable, isPrime, randomPrime
+from hashtable import UniversalHashFamily, MultiplyShiftHashFamily, TabulationHashFamily, KeyedHashFamily
+
+
+'''
+Checks the open addressing engine against a dictionary through a random mix
+of adds, overwrites and deletes, which also exercises tombstone reuse and
+rebuilding.
+'''
+def testOpenAddressing():
+
+    myTable = HashTable(engine='openaddressing')
+    assert isinstance(myTable, OpenAddressingHashTable)
+
+    # the engine can not be passed positionally, where it would be ignored
+    try:
+        HashTable(16, (1000000, 10000000), 'openaddressing')
+        assert False
+    except TypeError:
+        pass
+
+    expected = {}
+
+    for i in range(5000):
+        key = random.randint(0, 500)
+
+        if key in expected and random.random() < 0.4:
+            assert myTable.delete(key) == expected.pop(key)
+        else:
+            myTable.add(key, i)
+            expected[key] = i
+    
+    for key in range(501):
+        if key in expected:
+            assert myTable.get(key) == expected[key]
+        else:
+            try:
+                myTable.get(key)
+                assert False
+            except KeyError:
+                pass
+    
+    assert sorted(myTable.iterate()) == sorted(expected.items())
+
+
+'''
+Checks that keys stay reachable while an incremental migration is in
+progress, and that the migration eventually finishes.
+'''
+def testIncrementalResize():
+
+    myTable = HashTable(incrementalResize=True)
+    sawMigration = False
+
+    for i in range(2000):
+        myTable.add(i, str(i))
+        sawMigration = sawMigration or myTable.oldTable is not None
+
+        if i % 3 == 0:
+            assert myTable.delete(i) == str(i)
+        else:
+            assert myTable.get(i) == str(i)
+    
+    assert sawMigration
+    assert sorted(myTable.keys()) == [i for i in range(2000) if i % 3 != 0]
+
+    for i in range(2000):
+        if i % 3 != 0:
+            assert myTable.get(i) == str(i)
+    
+    assert myTable.oldTable is None
+
+
+'''
+Checks that every engine gives its memory back after a burst of keys drains,
+and that policies which could thrash are rejected.
+'''
+def testShrink():
+
+    for options in [{}, {'incrementalResize': True}, {'engine': 'openaddressing'}]:
+        myTable = HashTable(**options)
+
+        for i in range(10000):
+            myTable.add(i, i)
+        
+        assert myTable.size >= 10000
+
+        for i in range(9990):
+            assert myTable.delete(i) == i
+        
+        for i in range(9990, 10000):
+            assert myTable.get(i) == i
+        
+        assert myTable.size <= 128
+    
+    myTable = HashTable(resizePolicy=ResizePolicy(minSize=4096))
+    for i in range(10000):
+        myTable.add(i, i)
+    for i in range(10000):
+        myTable.delete(i)
+    assert myTable.size == 4096
+
+    try:
+        ResizePolicy(growAt=1.0, shrinkAt=0.5)
+        assert False
+    except ValueError:
+        pass
+
+    # open addressing doubles at half of growAt when tombstones fill the rest,
+    # so it needs shrinkAt below growAt/4
+    try:
+        HashTable(engine='openaddressing', resizePolicy=ResizePolicy(growAt=0.75, shrinkAt=0.3))
+        assert False
+    except ValueError:
+        pass
+
+    # a steady number of keys under delete/add churn keeps the table size
+    # stable once it has settled
+    policies = [None, ResizePolicy(growAt=0.75, shrinkAt=0.18), ResizePolicy(growAt=0.5, shrinkAt=0.1)]
+    for engine in ['chaining', 'openaddressing']:
+        for policy in policies:
+            myTable = HashTable(engine=engine, resizePolicy=policy)
+            live = list(range(100))
+            for key in live:
+                myTable.add(key, key)
+
+            nextKey = 100
+            sizeChanges = 0
+            for i in range(5000):
+                size = myTable.size
+                myTable.delete(live.pop(random.randrange(len(live))))
+                myTable.add(nextKey, nextKey)
+                live.append(nextKey)
+                nextKey += 1
+                sizeChanges += myTable.size != size
+
+            assert sizeChanges <= 2 and len(myTable) == 100
+
+
+'''
+Checks the bulk loading and bulk lookup functions on both engines
+'''
+def testBulk():
+
+    pairs = [(i, i*i) for i in range(3000)] + [("key" + str(i), i) for i in range(100)]
+
+    for engine in ['chaining', 'openaddressing']:
+        myTable = HashTable.from_items(pairs, engine=engine)
+        assert sorted(myTable.keys(), key=str) == sorted([pair[0] for pair in pairs], key=str)
+        assert myTable.get_many([5, "key7", 2999]) == [25, 7, 2999*2999]
+        assert myTable.get_many([1, -1], default=None) == [1, None]
+
+        myTable.update({1: "one", "new": 2})
+        assert myTable.get(1) == "one" and myTable.get("new") == 2
+        
+        try:
+            myTable.get_many([-1])
+            assert False
+        except KeyError:
+            pass
+
+    # NumPy is only imported by a large batch, never by importing the module
+    # or by small batches
+    script = "import sys, hashtable; hashtable.HashTable.from_items((i, i) for i in range(10)); assert 'numpy' not in sys.modules"
+    subprocess.run([sys.executable, "-c", script], cwd=test_file_dir, check=True)
+
+
+'''
+Checks the lazy views, including that adding a key during iteration is
+caught and that lookups during iteration do not disturb a migration
+'''
+def testViews():
+
+    for options in [{}, {'incrementalResize': True}, {'engine': 'openaddressing'}]:
+        myTable = HashTable.from_items([(i, -i) for i in range(100)], **options)
+
+        assert len(myTable.items()) == 100
+        assert sorted(myTable) == list(range(100))
+        assert sorted(myTable.values()) == list(range(-99, 1))
+        assert 5 in myTable and 500 not in myTable
+
+        try:
+            for key in myTable:
+                myTable.add(key + 1000, key)
+            assert False
+        except RuntimeError:
+            pass
+    
+    myTable = HashTable(incrementalResize=True)
+    for i in range(17):
+        myTable.add(i, i)
+    assert myTable.oldTable is not None
+
+    seen = []
+    for key, value in myTable.items():
+        seen.append(key)
+        myTable.get(key)
+    assert sorted(seen) == list(range(17))
+
+    # deleting a missing key changes nothing, so it must not move buckets
+    # under the iterator either
+    myTable = HashTable(incrementalResize=True)
+    for i in range(17):
+        myTable.add(i, i)
+    assert myTable.oldTable is not None
+
+    seen = []
+    for key, value in myTable.items():
+        seen.append(key)
+        try:
+            myTable.delete(1000 + key)
+        except KeyError:
+            pass
+    assert sorted(seen) == list(range(17))
+
+    # overwriting a key while the table sits at its grow limit must not
+    # resize it under the iterator
+    for options, numKeys in [({'size': 4}, 4), ({'size': 4, 'incrementalResize': True}, 4), ({'engine': 'openaddressing'}, 12)]:
+        myTable = HashTable(**options)
+        for i in range(numKeys):
+            myTable.add(i, i)
+        size = myTable.size
+
+        seen = []
+        for key, value in myTable.items():
+            seen.append((key, value))
+            myTable.add(0, 'x')
+
+        assert sorted(key for key, value in seen) == list(range(numKeys))
+        assert myTable.size == size and myTable.get(0) == 'x' and len(myTable) == numKeys
+
+
+'''
+Round trips tables through a snapshot file and checks lookups against the
+memory-mapped copy
+'''
+def testSnapshot():
+
+    pairs = [(i, [i]) for i in range(500)] + [("key" + str(i), None) for i in range(50)] + [((1, "a"), "tuple"), (2.5, "float")]
+
+    for engine in ['chaining', 'openaddressing']:
+        myTable = HashTable.from_items(pairs, engine=engine)
+        path = os.path.join(tempfile.mkdtemp(), "table.snap")
+        myTable.save(path)
+
+        with HashTable.load(path) as mapped:
+            assert isinstance(mapped, MappedHashTable)
+            assert len(mapped) == len(pairs)
+
+            for key, value in pairs:
+                assert mapped.get(key) == value
+            
+            assert (1, "a") in mapped and "missing" not in mapped and 1.0 in mapped
+            assert sorted(mapped.items(), key=str) == sorted(pairs, key=str)
+        
+        os.remove(path)
+    
+    path = os.path.join(tempfile.mkdtemp(), "empty.snap")
+    HashTable().save(path)
+    with MappedHashTable(path) as mapped:
+        assert len(mapped) == 0 and 1 not in mapped
+    os.remove(path)
+
+
+'''
+Checks the Miller-Rabin test against trial division and that tables share
+hash parameters by default
+'''
+def testPrimes():
+
+    for n in range(2000):
+        assert isPrime(n) == (n > 1 and all(n % d != 0 for d in range(2, int(n**0.5) + 1)))
+    
+    assert isPrime(2**61 - 1) and not isPrime(3215031751)
+
+    for i in range(20):
+        p = randomPrime(1000000, 10000000)
+        assert 1000000 <= p < 10000000 and isPrime(p)
+    
+    assert HashTable().hashFamily.p == HashTable().hashFamily.p
+    assert isPrime(HashTable(sharedParameters=False).hashFamily.p)
+
+
+'''
+Runs both engines with every hash family
+'''
+def testHashFamilies():
+
+    keys = list(range(-500, 500)) + ["key" + str(i) for i in range(300)] + [(1, "a"), b"bytes", 2.5]
+
+    for family in [UniversalHashFamily(), MultiplyShiftHashFamily(), TabulationHashFamily(), KeyedHashFamily()]:
+        for engine in ['chaining', 'openaddressing']:
+            myTable = HashTable(engine=engine, hashFamily=family)
+
+            for key in keys:
+                myTable.add(key, str(key))
+            for key in keys[::2]:
+                assert myTable.delete(key) == str(key)
+            
+            assert sorted(myTable.keys(), key=str) == sorted(keys[1::2], key=str)
+            assert myTable.get_many(keys[1::2]) == [str(key) for key in keys[1::2]]
+            assert myTable.get(1.0) == myTable.get(1)
+    
+    family = KeyedHashFamily()
+    assert family.hash((1, "a")) == family.hash((1.0, "a"))
+
+    # ints are hashed by value, not by hash(), which wraps modulo 2^61-1
+    assert hash(5) == hash(5 + 2**61 - 1)
+    assert family.hash(5) != family.hash(5 + 2**61 - 1)
+
+    # equal numbers of different types still hash alike
+    assert family.hash(2) == family.hash(2.0) == family.hash(Fraction(2)) == family.hash(Decimal(2)) == family.hash(2 + 0j)
+    assert family.hash(True) == family.hash(1)
+    assert family.hash(0.5) == family.hash(Fraction(1, 2)) == family.hash(Decimal('0.5'))
+    assert family.hash(0.5) != family.hash(0.25)
+    assert family.hash(float('inf')) == family.hash(float('inf'))
+
+    try:
+        HashTable(size=12, hashFamily=MultiplyShiftHashFamily())
+        assert False
+    except ValueError:
+        pass
+
+
+'''
+Checks the statistics report on both engines and that it survives a round
+trip through JSON
+'''
+def testStats():
+
+    for options in [{}, {'incrementalResize': True}, {'engine': 'openaddressing'}]:
+        myTable = HashTable(collectStats=True, **options)
+
+        for i in range(1000):
+            myTable.add(i, i)
+        for i in range(1000):
+            myTable.get(i)
+        for i in range(500):
+            myTable.delete(i)
+        
+        stats = myTable.getStats()
+        assert stats['numKeys'] == 500
+        assert stats['operations'] == {'get': 1000, 'add': 1000, 'delete': 500}
+        assert stats['maxProbes'] >= 1
+
+        # open addressing reads at least one slot per operation, but chaining
+        # counts 0 probes for a miss on an empty bucket, so its average can
+        # drop below 1
+        if options.get('engine') == 'openaddressing':
+            assert stats['averageProbes'] >= 1
+        else:
+            assert stats['averageProbes'] > 0
+
+        assert stats['resizes'] > 0
+        assert stats['hashFamily']['family'] == 'universal'
+
+        histogram = stats.get('chainLengthHistogram', stats.get('probeLengthHistogram'))
+        if 'chainLengthHistogram' in stats:
+            assert sum(length * count for length, count in histogram.items()) == 500
+        else:
+            assert sum(histogram.values()) == 500
+
+        path = os.path.join(tempfile.mkdtemp(), "stats.json")
+        myTable.dumpStats(path)
+        with open(path) as statsFile:
+            assert json.load(statsFile)['numKeys'] == 500
+        os.remove(path)
+    
+    assert 'operations' not in HashTable().getStats()
+
+
+'''
+Compares the hash families on sequential integers, strided integers and
+strings. Collisions are counted as keys that land in an occupied bucket of a
+table with as many buckets as keys, and throughput is adds plus gets per second
+'''
+def benchmarkHashFamilies(numKeys=2**16):
+
+    workloads = [
+        ("sequential ints", list(range(numKeys))),
+        ("strided ints", [i * 1024 for i in range(numKeys)]),
+        ("strings", ["user:" + str(i) for i in range(numKeys)])
+    ]
+
+    for name, family in [("universal", UniversalHashFamily()), ("multiplyshift", MultiplyShiftHashFamily()), ("tabulation", TabulationHashFamily()), ("keyed", KeyedHashFamily())]:
+        for workload, keys in workloads:
+            shift = family.indexShift(numKeys)
+            buckets = set((family.hash(key) >> shift) % numKeys for key in keys)
+            collisions = numKeys - len(buckets)
+
+            myTable = HashTable(engine='openaddressing', hashFamily=family)
+            start_time = time.perf_counter()
+            for key in keys:
+                myTable.add(key, key)
+            for key in keys:
+                myTable.get(key)
+            stop_time = time.perf_counter()
+
+            print(name + ", " + workload + ": " + str(collisions) + " collisions, " + str(int(2 * numKeys / (stop_time - start_time))) + " ops/s")
+
+
+'''
+Times creating many small tables
+'''
+def benchmarkConstruction(numTables=100000):
+
+    start_time = time.perf_counter()
+    for i in range(numTables):
+        HashTable()
+    stop_time = time.perf_counter()
+
+    print("construction: " + str((stop_time - start_time) / numTables * 1e6) + " us/table")
+
+
+'''
+Times loading numKeys integer keys one add at a time against from_items
+'''
+def benchmarkBulkLoad(numKeys=1000000):
+
+    pairs = [(i, i) for i in range(numKeys)]
+
+    start_time = time.perf_counter()
+    myTable = HashTable()
+    for key, value in pairs:
+        myTable.add(key, value)
+    stop_time = time.perf_counter()
+    print("add loop: " + str(stop_time - start_time) + " s")
+
+    start_time = time.perf_counter()
+    myTable = HashTable.from_items(pairs)
+    stop_time = time.perf_counter()
+    print("from_items: " + str(stop_time - start_time) + " s")
+
+
+'''
+Reports the slowest single add with stop-the-world and incremental resizing
+'''
+def benchmarkWorstCaseAdd(numKeys=500000):
+
+    for incremental in [False, True]:
+        myTable = HashTable(incrementalResize=incremental)
+        worst = 0
+
+        for i in range(numKeys):
+            start_time = time.perf_counter()
+            myTable.add(i, i)
+            worst = max(worst, time.perf_counter() - start_time)
+        
+        print("incremental=" + str(incremental) + ": worst add " + str(worst * 1e3) + " ms")
+
+
+'''
+Compares memory per key and average get latency of the two engines. Keys
+are looked up in random order so neither engine benefits from allocation order
+'''
+def benchmarkEngines(numKeys=200000):
+
+    for engine in ['chaining', 'openaddressing']:
+        tracemalloc.start()
+        myTable = HashTable(engine=engine)
+
+        for i in range(numKeys):
+            myTable.add(i, i)
+        
+        memory = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+
+        lookupOrder = list(range(numKeys))
+        random.shuffle(lookupOrder)
+
+        start_time = time.perf_counter()
+        for i in lookupOrder:
+            myTable.get(i)
+        stop_time = time.perf_counter()
+
+        print(engine + ": " + str(memory / numKeys) + " bytes/key, " + str((stop_time - start_time) / numKeys * 1e9) + " ns/get")
 
 
 if __name__ == "__main__":
@@ -32,3 +515,17 @@ if __name__ == "__main__":
     myTable.add(10, "hello")
     print(myTable.get(10))
 
+    testOpenAddressing()
+    testIncrementalResize()
+    testShrink()
+    testBulk()
+    testViews()
+    testSnapshot()
+    testPrimes()
+    testHashFamilies()
+    testStats()
+    benchmarkEngines()
+    benchmarkWorstCaseAdd()
+    benchmarkBulkLoad()
+    benchmarkConstruction()
+    benchmarkHashFamilies()
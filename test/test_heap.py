@@ -6,13 +6,16 @@ Tests the heap data structure and the heapsort algorithm.
 
 import os
 import sys
+import time
+import heapq
+import random
 
 current_dir = os.path.dirname(__file__)
 test_file_dir = os.path.join(current_dir, '..', 'heap')
 sys.path.append(test_file_dir)
 
-from heap import MaxHeap
-from heap import heapSort
+from heap import MaxHeap, Heap, DaryHeap, PairingHeap
+from heap import heapSort, heapSortInPlace, top_k, kmerge
 
 
 def testHeap(list):
@@ -26,8 +29,366 @@ def testHeap(list):
     print(myHeap.array)
 
 
+def testPushPop():
+
+    # with and without the heapq fast path
+    for useHeapq in (True, False):
+        myHeap = MaxHeap()
+        myHeap.useHeapq = myHeap.useHeapq and useHeapq
+        items = [random.randrange(1000) for i in range(2000)]
+
+        for item in items:
+            myHeap.push(item)
+
+        assert len(myHeap) == 2000 and myHeap.verifyMaxHeap()
+        assert myHeap.peek() == max(items)
+
+        popped = [myHeap.pop() for i in range(2000)]
+        assert popped == sorted(items, reverse=True)
+        assert myHeap.extractMax() is None
+
+        try:
+            myHeap.pop()
+            assert False
+        except IndexError:
+            pass
+
+        myHeap.array = [9, 3, 5, 1]
+        assert myHeap.pushpop(10) == 10 and myHeap.pushpop(4) == 9
+        assert myHeap.replace(0) == 5 and myHeap.verifyMaxHeap()
+        assert sorted(myHeap.array) == [0, 1, 3, 4]
+
+
+def testHandles():
+
+    myHeap = MaxHeap(range(50), trackHandles=True)
+    handles = {}
+
+    for item in range(100, 200, 5):
+        handles[item] = myHeap.push(item)
+
+    myHeap.increase_key(handles[100], 1000)
+    assert myHeap.peek() == 1000 and myHeap.itemOf(handles[100]) == 1000
+
+    myHeap.decrease_key(handles[195], -1)
+    assert myHeap.verifyMaxHeap()
+
+    try:
+        myHeap.increase_key(handles[190], 0)
+        assert False
+    except ValueError:
+        pass
+
+    assert myHeap.pop() == 1000 and handles[100].position == -1
+    assert myHeap.pop() == 190 and myHeap.verifyMaxHeap()
+
+    try:
+        myHeap.decrease_key(handles[100], 0)
+        assert False
+    except ValueError:
+        pass
+
+
+def testKeyedHeap():
+
+    records = [(random.randrange(20), i) for i in range(500)]
+
+    for reverse in (False, True):
+        myHeap = Heap(records[:250], key=lambda record: record[0], reverse=reverse)
+
+        for record in records[250:]:
+            myHeap.push(record)
+
+        assert len(myHeap) == 500
+        assert myHeap.peek() == sorted(records, key=lambda record: record[0], reverse=reverse)[0]
+
+        # ties come out in insertion order, as in a stable sort
+        popped = [myHeap.pop() for i in range(500)]
+        assert popped == sorted(records, key=lambda record: record[0], reverse=reverse)
+
+    # items without an ordering of their own are never compared
+    myHeap = Heap(key=len)
+    for item in [{1: 1}, {}, {1: 1, 2: 2}, {3: 3}]:
+        myHeap.push(item)
+
+    assert myHeap.pop() == {} and myHeap.pop() == {1: 1}
+    assert myHeap.pushpop({}) == {} and myHeap.replace({4: 4}) == {3: 3}
+    assert myHeap.pop() == {4: 4}
+
+    myHeap = Heap([1, 2, 3], reverse=True)
+    assert myHeap.pushpop(2) == 3 and myHeap.replace(0) == 2 and myHeap.pop() == 2
+
+
+def testHeapSortKey():
+
+    words = ["pear", "fig", "apple", "kiwi", "banana", "date"]
+
+    assert heapSort(words, key=len) == sorted(words, key=len)
+    assert heapSort(words, key=len, reverse=True) == sorted(words, key=len, reverse=True)
+
+
+def testHeapSort():
+
+    for size in [0, 1, 2, 3, 10, 1001]:
+        array = [random.randrange(100) for i in range(size)]
+
+        assert heapSort(array) == sorted(array)
+        assert heapSort(array, reverse=True) == sorted(array, reverse=True)
+
+        output = [None] * (size + 2)
+        assert heapSort(array, output=output)[:size] == sorted(array)
+
+        for reverse in (False, True):
+            inPlace = array.copy()
+            assert heapSortInPlace(inPlace, reverse=reverse) is inPlace
+            assert inPlace == sorted(array, reverse=reverse)
+
+            inPlace = array.copy()
+            heapSortInPlace(inPlace, reverse=reverse, key=lambda item: -item)
+            assert inPlace == sorted(array, key=lambda item: -item, reverse=reverse)
+
+    try:
+        heapSort([3, 2, 1], output=[None])
+        assert False
+    except ValueError:
+        pass
+
+
+def benchmarkHeapSort():
+
+    array = [random.random() for i in range(1000000)]
+
+    start = time.perf_counter()
+    heapSort(array)
+    print("heapSort, 1M items: " + str(round(time.perf_counter() - start, 2)) + " s")
+
+    start = time.perf_counter()
+    heapSortInPlace(array)
+    print("heapSortInPlace, 1M items: " + str(round(time.perf_counter() - start, 2)) + " s")
+
+
+# the same checks run against every priority queue
+def makeQueues():
+    return [
+        MaxHeap(trackHandles=True),
+        DaryHeap(3, trackHandles=True),
+        DaryHeap(4, trackHandles=True),
+        PairingHeap()
+    ]
+
+
+def testPriorityQueues():
+
+    for myQueue in makeQueues():
+        items = [random.randrange(10000) for i in range(1000)]
+        handles = [myQueue.push(item) for item in items]
+        live = dict(enumerate(items))
+
+        for i in range(0, 1000, 3):
+            live[i] += random.randrange(100)
+            myQueue.increase_key(handles[i], live[i])
+
+        for i in range(1, 1000, 3):
+            live[i] -= random.randrange(100)
+            myQueue.decrease_key(handles[i], live[i])
+
+        assert myQueue.verifyMaxHeap() and len(myQueue) == 1000
+        assert myQueue.itemOf(handles[5]) == live[5]
+        assert myQueue.peek() == max(live.values())
+
+        popped = [myQueue.pop() for i in range(500)]
+        assert popped == sorted(live.values(), reverse=True)[:500]
+        assert myQueue.verifyMaxHeap()
+
+        assert myQueue.pushpop(10**6) == 10**6
+        heapMax = myQueue.peek()
+        assert myQueue.replace(-10**6) == heapMax
+
+        # the items pushed by pushpop_handle and replace_handle keep handles
+        assert myQueue.pushpop_handle(10**6) == (10**6, None)
+        heapMax = myQueue.peek()
+        popped, handle = myQueue.replace_handle(-10**5)
+        assert popped == heapMax and myQueue.itemOf(handle) == -10**5
+
+        popped, handle = myQueue.pushpop_handle(-10**5 + 1)
+        myQueue.decrease_key(handle, -10**6)
+        assert myQueue.itemOf(handle) == -10**6 and myQueue.verifyMaxHeap()
+
+        popped = [myQueue.extractMax() for i in range(500)]
+        assert popped[-2:] == [-10**6, -10**6] and myQueue.extractMax() is None
+
+        try:
+            myQueue.increase_key(handles[0], 10**7)
+            assert False
+        except ValueError:
+            pass
+
+    for d in (2, 5):
+        array = [random.random() for i in range(100)]
+        myHeap = DaryHeap(d, array)
+        assert myHeap.verifyMaxHeap()
+        assert [myHeap.pop() for i in range(100)] == sorted(array, reverse=True)
+
+
+def testMeld():
+
+    first = PairingHeap(range(0, 100, 2))
+    second = PairingHeap(range(1, 100, 2))
+    first.meld(second)
+
+    assert len(first) == 100 and len(second) == 0 and first.verifyMaxHeap()
+    assert [first.pop() for i in range(100)] == list(range(99, -1, -1))
+
+    # handles follow their items through a meld, and a live node of another
+    # heap is rejected without touching either heap
+    first = PairingHeap(range(10))
+    second = PairingHeap()
+    handle = second.push(5)
+    second.push(50)
+    first.meld(second)
+    first.increase_key(handle, 500)
+    assert first.peek() == 500 and first.verifyMaxHeap()
+
+    other = PairingHeap(range(10))
+    foreign = other.push(-1)
+
+    for method, item in [(first.increase_key, 1000), (first.decrease_key, -1000), (first.itemOf, None)]:
+        try:
+            method(foreign) if item is None else method(foreign, item)
+            assert False
+        except ValueError:
+            pass
+
+    assert len(first) == 12 and first.verifyMaxHeap()
+    assert len(other) == 11 and other.verifyMaxHeap() and other.itemOf(foreign) == -1
+
+    try:
+        first.meld(first)
+        assert False
+    except ValueError:
+        pass
+
+    assert len(first) == 12 and first.verifyMaxHeap()
+
+
+# runs the same Dijkstra-like trace of pushes, pops and priority increases
+# against each queue. Items are (priority, id) so popped items can retire
+# their handles
+def benchmarkPriorityQueues():
+
+    random.seed(1)
+    trace = []
+    nextId = 0
+    live = []
+
+    for i in range(300000):
+        choice = random.random()
+
+        if choice < 0.45 or len(live) == 0:
+            trace.append(('push', nextId, random.random()))
+            live.append(nextId)
+            nextId += 1
+        elif choice < 0.7:
+            trace.append(('pop',))
+        else:
+            trace.append(('increase', random.randrange(nextId), random.random()))
+
+    for myQueue in makeQueues():
+        handles = {}
+        priorities = {}
+        start = time.perf_counter()
+
+        for op in trace:
+            if op[0] == 'push':
+                priorities[op[1]] = op[2]
+                handles[op[1]] = myQueue.push((op[2], op[1]))
+
+            elif op[0] == 'pop':
+                if len(myQueue) > 0:
+                    del handles[myQueue.pop()[1]]
+
+            elif op[1] in handles:
+                priority = priorities[op[1]] + op[2]
+                priorities[op[1]] = priority
+                myQueue.increase_key(handles[op[1]], (priority, op[1]))
+
+        elapsed = time.perf_counter() - start
+        name = type(myQueue).__name__ + ("(" + str(myQueue.d) + ")" if isinstance(myQueue, DaryHeap) else "")
+        print(name + ": " + str(round(len(trace) / elapsed)) + " ops/s")
+
+
+def testTopK():
+
+    records = [(random.randrange(50), i) for i in range(2000)]
+    byKey = lambda record: record[0]
+
+    for k in [0, 1, 10, 2000, 3000]:
+        expected = sorted(records, key=byKey, reverse=True)[:k]
+        assert top_k(iter(records), k, key=byKey) == expected
+
+    assert top_k([3, 1, 4, 1, 5, 9, 2, 6], 3) == [9, 6, 5]
+
+
+def testKMerge():
+
+    runs = [sorted(random.randrange(100) for i in range(size)) for size in [0, 1, 50, 200, 7]]
+    assert list(kmerge(*runs)) == sorted(sum(runs, []))
+    assert list(kmerge()) == [] and list(kmerge([], [])) == []
+
+    # equal keys come out in the order of their runs
+    first = [(1, 'a'), (2, 'a'), (2, 'b')]
+    second = [(0, 'c'), (2, 'c'), (3, 'c')]
+    merged = list(kmerge(iter(first), iter(second), key=lambda record: record[0]))
+    assert merged == sorted(first + second, key=lambda record: record[0])
+
+    # the merge is lazy, so infinite runs work
+    evens = (i for i in range(0, 10**12, 2))
+    odds = (i for i in range(1, 10**12, 2))
+    merged = kmerge(evens, odds)
+    assert [next(merged) for i in range(10)] == list(range(10))
+
+
+# compares push and pop throughput with heapq, which is implemented in C.
+# heapq is a min heap, so it is given negated items
+def benchmarkPushPop():
+
+    items = [random.random() for i in range(200000)]
+
+    start = time.perf_counter()
+    myHeap = MaxHeap()
+    for item in items:
+        myHeap.push(item)
+    while len(myHeap) > 0:
+        myHeap.pop()
+    heapTime = time.perf_counter() - start
+
+    start = time.perf_counter()
+    queue = []
+    for item in items:
+        heapq.heappush(queue, -item)
+    while len(queue) > 0:
+        heapq.heappop(queue)
+    heapqTime = time.perf_counter() - start
+
+    print("MaxHeap: " + str(round(2*len(items) / heapTime)) + " ops/s")
+    print("heapq: " + str(round(2*len(items) / heapqTime)) + " ops/s")
+
+
 if __name__ == "__main__":
 
+    testPushPop()
+    testHandles()
+    testKeyedHeap()
+    testHeapSortKey()
+    testHeapSort()
+    testPriorityQueues()
+    testMeld()
+    testTopK()
+    testKMerge()
+    benchmarkPushPop()
+    benchmarkPriorityQueues()
+    benchmarkHeapSort()
+
     myList = [2, 3, 4, 5, 1, 6, 7, 3, 9, 8, 7, 2, 8]
     myList2 = [1, 2]
 
@@ -0,0 +1,114 @@
+'''
+File: test_shardedtable.py
+Author: Joshua Jacobs-Rebhun
+Date: January 11, 2022
+
+This is the test file for the sharded hashtable
+'''
+
+
+import os
+import sys
+import time
+import threading
+
+current_dir = os.path.dirname(__file__)
+test_file_dir = os.path.join(current_dir, "..", "hash")
+sys.path.append(test_file_dir)
+
+from shardedtable import ShardedHashTable
+
+
+'''
+Several threads write disjoint key ranges while others read. At the end
+every thread's keys must be present with their final values.
+'''
+def testConcurrentWrites():
+
+    myTable = ShardedHashTable(numShards=8)
+    numThreads = 8
+    keysPerThread = 2000
+
+    def writer(threadNumber):
+        for i in range(threadNumber * keysPerThread, (threadNumber + 1) * keysPerThread):
+            myTable.add(i, i)
+            if i % 2 == 0:
+                myTable.delete(i)
+    
+    def reader():
+        for i in range(numThreads * keysPerThread):
+            try:
+                assert myTable.get(i) == i
+            except KeyError:
+                pass
+    
+    threads = [threading.Thread(target=writer, args=(n,)) for n in range(numThreads)]
+    threads += [threading.Thread(target=reader) for n in range(2)]
+
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    
+    assert len(myTable) == numThreads * keysPerThread // 2
+    assert sorted(myTable) == list(range(1, numThreads * keysPerThread, 2))
+
+
+'''
+A snapshot keeps the contents it was taken with, and unchanged shards are
+shared between snapshots
+'''
+def testSnapshot():
+
+    myTable = ShardedHashTable(numShards=4)
+    myTable.update((i, str(i)) for i in range(100))
+
+    first = myTable.snapshot()
+    myTable.add(5, "changed")
+    myTable.add(1000, "new")
+
+    assert first.get(5) == "5" and 1000 not in first and len(first) == 100
+
+    second = myTable.snapshot()
+    assert second.get(5) == "changed" and second.get(1000) == "new"
+
+    changedShards = set([myTable.shardIndex(5), myTable.shardIndex(1000)])
+    for index in range(4):
+        assert (first.shards[index] is second.shards[index]) == (index not in changedShards)
+
+
+'''
+Times a mixed read/write workload from several threads
+'''
+def benchmarkThreads(numThreads=8, opsPerThread=50000):
+
+    myTable = ShardedHashTable(numShards=16)
+
+    def worker(threadNumber):
+        for i in range(opsPerThread):
+            key = (threadNumber * 7919 + i) % 10000
+            if i % 4 == 0:
+                myTable.add(key, i)
+            else:
+                try:
+                    myTable.get(key)
+                except KeyError:
+                    pass
+    
+    threads = [threading.Thread(target=worker, args=(n,)) for n in range(numThreads)]
+
+    start_time = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    stop_time = time.perf_counter()
+
+    print(str(int(numThreads * opsPerThread / (stop_time - start_time))) + " ops/s")
+
+
+if __name__ == "__main__":
+
+    testConcurrentWrites()
+    testSnapshot()
+    benchmarkThreads()
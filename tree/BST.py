@@ -6,9 +6,21 @@ Date: January 1, 2022
 This file implements a binary search tree data structure.
 '''
 
+import os
+from array import array
+
+
+# setting this environment variable turns on rep invariant checks for trees
+# built without an explicit checkRep. Its value is the number of operations
+# between checks, so 1 checks after every insert and delete
+CHECK_REP_ENV = 'BST_CHECK_REP'
+
 
 class Node:
 
+    # fixed set of fields, so nodes carry no per-instance __dict__
+    __slots__ = ('leftChild', 'rightChild', 'parent', 'value')
+
     # default constructor creates empty node
     def __init__(self, value=None, parent=None, leftChild=None, rightChild=None):
         self.leftChild = leftChild
@@ -56,101 +68,261 @@ class Node:
     
 
 
+'''
+Node that also records the number of nodes in its subtree, for trees with
+order statistics.
+'''
+class SizedNode(Node):
+
+    __slots__ = ('size',)
+
+    def __init__(self, value=None, parent=None, leftChild=None, rightChild=None):
+        super().__init__(value, parent, leftChild, rightChild)
+        self.size = 1
+
+
+def size(node):
+    return 0 if node is None else node.size
+
+
+
+'''
+Binary search tree of values, with equal values going left. Checking the rep
+invariant walks the whole tree, so it is off by default and insert and
+delete only do O(h) work. Passing checkRep=True, or setting the BST_CHECK_REP
+environment variable, checks the tree after every checkEvery inserts and
+deletes and raises if it is broken.
+
+With orderStatistics=True every node also keeps the size of its subtree,
+updated on the way back up from each insert and delete. select, rank,
+count_range and percentile then run in O(h) instead of walking the tree.
+'''
 class BinarySearchTree:
+
+    # class of the nodes the tree creates, called as nodeType(value, parent),
+    # and the class used when order statistics are on
+    nodeType = Node
+    sizedNodeType = SizedNode
     
     # default constructor creates empty BST
-    def __init__(self, value=None):
+    def __init__(self, value=None, checkRep=None, checkEvery=1, orderStatistics=False):
         self.root = None
         self.value = value
+        self.orderStatistics = orderStatistics
+
+        if orderStatistics:
+            self.nodeType = self.sizedNodeType
+
+        if checkRep is None:
+            setting = os.environ.get(CHECK_REP_ENV, '')
+            checkRep = setting not in ('', '0')
+
+            if setting.isdigit() and checkRep:
+                checkEvery = int(setting)
+
+        if checkEvery < 1:
+            raise ValueError("checkEvery must be at least 1.")
+
+        self.checkEvery = checkEvery if checkRep else 0
+        self.numOperations = 0
+    
+
+    # builds a perfectly balanced tree from values in ascending order in O(n),
+    # with no per-insert work. The middle value becomes the root and each half
+    # becomes a subtree, so the recursion is only log2(n) deep. The keyword
+    # arguments go to the constructor
+    @classmethod
+    def from_sorted(cls, seq, **kwargs):
+        tree = cls(**kwargs)
+        values = seq if isinstance(seq, list) else list(seq)
+
+        for i in range(1, len(values)):
+            if values[i] < values[i - 1]:
+                raise ValueError("from_sorted needs its values in ascending order.")
+
+        tree.root = tree.__buildBalanced(values, 0, len(values), None)
+
+        if tree.checkEvery and not tree.__checkRep(tree.root):
+            raise Exception("Rep invariant violated.")
+
+        return tree
+
+
+    # sorts the values and bulk loads them, in O(n log n) whatever their order
+    @classmethod
+    def from_iterable(cls, iterable, **kwargs):
+        return cls.from_sorted(sorted(iterable), **kwargs)
+
+
+    def __buildBalanced(self, values, low, high, parent):
+
+        if low >= high:
+            return None
+
+        middle = (low + high) // 2
+        node = self.nodeType(values[middle], parent)
+        node.leftChild = self.__buildBalanced(values, low, middle, node)
+        node.rightChild = self.__buildBalanced(values, middle + 1, high, node)
+        self._updateNode(node)
+
+        return node
     
 
-    # checks the rep invariant of the data structure
+    # checks the rep invariant of the data structure: every value in a left
+    # subtree is at most its ancestor's value, every value in a right subtree
+    # at least, and the parent pointers match. Walks the tree with an
+    # explicit stack, so deep trees do not hit the recursion limit
     def __checkRep(self, node):
-        if node.isLeaf():
+
+        if node is None:
             return True
-        elif node.getLeftChild() is None:
-            return node.value <= node.getRightChild().value and self.__checkRep(node.getRightChild())
-        elif node.getRightChild() is None:
-            return node.value >= node.getLeftChild().value and self.__checkRep(node.getLeftChild())
-        else:
-            leftSubTreeValid = self.__checkRep(node.getLeftChild())
-            rightSubTreeValid = self.__checkRep(node.getRightChild())
-            currentNodeValid = node.value >= node.getLeftChild().value and node.value <= node.getRightChild().value
-            return leftSubTreeValid and rightSubTreeValid and currentNodeValid
+
+        if node.parent is not None:
+            return False
+
+        # each entry is a node with the bounds its value has to lie within,
+        # where None means unbounded
+        stack = [(node, None, None)]
+
+        while len(stack) > 0:
+            node, low, high = stack.pop()
+
+            if low is not None and node.value < low:
+                return False
+            if high is not None and node.value > high:
+                return False
+
+            if self.orderStatistics and node.size != 1 + size(node.leftChild) + size(node.rightChild):
+                return False
+
+            if node.getLeftChild() is not None:
+                if node.getLeftChild().parent is not node:
+                    return False
+                stack.append((node.getLeftChild(), low, node.value))
+
+            if node.getRightChild() is not None:
+                if node.getRightChild().parent is not node:
+                    return False
+                stack.append((node.getRightChild(), node.value, high))
+
+        return True
+
+
+    # counts an insert or delete, and checks the rep invariant if checks are
+    # on and this operation is sampled
+    def _afterOperation(self):
+
+        if self.checkEvery == 0:
+            return
+
+        self.numOperations += 1
+
+        if self.numOperations % self.checkEvery == 0 and not self.__checkRep(self.root):
+            raise Exception("Rep invariant violated.")
     
     
 
-    # private insert method implements the actual insertion of nodes.
-    # public insert method is simply a wrapper method that provides a nice
-    # interface for the user
-    def __insert(self, value, node):
-        
-        if value <= node.value:
-            if node.getLeftChild() is not None:
-                self.__insert(value, node.getLeftChild())
-            else:
-                nodeToInsert = Node(value)
-                nodeToInsert.parent = node
-                node.leftChild = nodeToInsert
-        
+    # replaces node in its parent, or as the root, with child, which may be
+    # None
+    def _replaceChild(self, node, child):
+
+        if node.parent is None:
+            self.root = child
+        elif node.parent.leftChild is node:
+            node.parent.leftChild = child
         else:
-            if node.getRightChild() is not None:
-                self.__insert(value, node.getRightChild())
-            else:
-                nodeToInsert = Node(value)
-                nodeToInsert.parent = node
-                node.rightChild = nodeToInsert
+            node.parent.rightChild = child
+
+        if child is not None:
+            child.parent = node.parent
+
+
+    # recomputes the fields a node derives from its children
+    def _updateNode(self, node):
+
+        if self.orderStatistics:
+            node.size = 1 + size(node.leftChild) + size(node.rightChild)
+
+
+    # updates the subtree sizes from node up to the root
+    def _updateSizes(self, node):
+
+        if self.orderStatistics:
+            while node is not None:
+                node.size = 1 + size(node.leftChild) + size(node.rightChild)
+                node = node.parent
 
-    # insert a value into the tree
+
+    # copies what a node holds, as opposed to its links and derived fields,
+    # from source to target. Used when delete moves a predecessor up
+    def _copyContents(self, source, target):
+        target.value = source.value
+
+
+    # called with the lowest node whose subtree changed after an insert or
+    # delete. Balanced trees override it to restore their balance on the way
+    # up to the root
+    def _rebalance(self, node):
+        self._updateSizes(node)
+
+
+    # insert a value into the tree. Equal values go left. The descent is a
+    # loop, so a degenerate tree does not hit the recursion limit
     def insert(self, value):
         
         if self.root is None:
-            self.root = Node(value)
+            self.root = self.nodeType(value)
         else:
-            self.__insert(value, self.root)
+            node = self.root
+
+            while True:
+                if value <= node.value:
+                    if node.leftChild is None:
+                        node.leftChild = self.nodeType(value, node)
+                        break
+                    node = node.leftChild
+                else:
+                    if node.rightChild is None:
+                        node.rightChild = self.nodeType(value, node)
+                        break
+                    node = node.rightChild
+
+            self._rebalance(node)
         
-        if not self.__checkRep(self.root):
-            raise Exception("Rep invariant violated")
+        self._afterOperation()
     
 
-    # private get method gets the desired value recursively. This method
-    # actually implements the functionality and the public get method simply
-    # provides a user-friendly interface
-    def __get(self, value, node):
-        
-        if value == node.value:
-            return node
-        
-        elif value < node.value:
-            if node.getLeftChild() is not None:
-                return self.__get(value, node.getLeftChild())
-            else:
-                return None
-        
-        else:
-            if node.getRightChild() is not None:
-                return self.__get(value, node.getRightChild())
+    # get the node holding a value, or None if the value is not in the tree
+    def getNode(self, value):
+        node = self.root
+
+        while node is not None:
+            if value == node.value:
+                return node
+            elif value < node.value:
+                node = node.leftChild
             else:
-                return None
+                node = node.rightChild
+
+        return None
+
 
-    # get a value from the tree
+    # same as getNode. Subclasses may return something other than the node,
+    # so the tree itself always looks nodes up with getNode
     def get(self, value):
-        
-        if self.root is None:
-            return None
-        else:
-            return self.__get(value, self.root)
+        return self.getNode(value)
     
 
-    # private get largest recursively finds largest value
+    # private get largest finds the largest value in the subtree of node
     def __max(self, node, returnNode=False):
-        if node.getRightChild() is None:
-            if returnNode:
-                return node
-            else:
-                return node.value
+
+        while node.rightChild is not None:
+            node = node.rightChild
+
+        if returnNode:
+            return node
         else:
-            return self.__max(node.getRightChild(), returnNode)
+            return node.value
 
     # get the largest value
     def max(self, returnNode=False):
@@ -162,15 +334,16 @@ class BinarySearchTree:
             return self.__max(self.root, returnNode)
     
 
-    # private get smallest method recursively finds the smallest element
+    # private get smallest finds the smallest value in the subtree of node
     def __min(self, node, returnNode=False):
-        if node.getLeftChild() is None:
-            if returnNode:
-                return node
-            else:
-                return node.value
+
+        while node.leftChild is not None:
+            node = node.leftChild
+
+        if returnNode:
+            return node
         else:
-            return self.__min(node.getLeftChild(), returnNode)
+            return node.value
 
     # get the smallest value
     def min(self, returnNode=False):
@@ -182,240 +355,1187 @@ class BinarySearchTree:
             return self.__min(self.root, returnNode)
         
 
-    # implements the recursion for getting next larger element
-    def __getOneLarger(self, node):
-        
-        if node.isRoot():
-            return None
-        elif node.isLeftChild():
-            return node.parent.value
-        else:
-            return self.__getOneLarger(node.parent)
+    def __requireOrderStatistics(self):
 
-    # get the value of the next largest element in the tree
-    def getOneLarger(self, value):
+        if not self.orderStatistics:
+            raise Exception("Order statistics are off. Build the tree with orderStatistics=True.")
 
-        # find the node in the tree
-        node = self.get(value)
 
-        # if node not found, then raise error
-        if node is None:
-            raise Exception("Value not in tree.")
+    # the number of values in the tree
+    def __len__(self):
+
+        if self.orderStatistics:
+            return size(self.root)
+
+        return sum(1 for node in self.iter_inorder(nodes=True))
+
+
+    # the k-th smallest value, counting from 0. Negative k counts from the
+    # largest value, as for lists
+    def select(self, k):
+        self.__requireOrderStatistics()
+
+        if k < 0:
+            k += size(self.root)
+
+        if k < 0 or k >= size(self.root):
+            raise IndexError("Rank out of range")
+
+        node = self.root
+        while True:
+            leftSize = size(node.leftChild)
+
+            if k < leftSize:
+                node = node.leftChild
+            elif k == leftSize:
+                return node.value
+            else:
+                k -= leftSize + 1
+                node = node.rightChild
+
+
+    # the number of values strictly smaller than value, which is the index
+    # select would find value at if it is in the tree
+    def rank(self, value):
+        self.__requireOrderStatistics()
+
+        count = 0
+        node = self.root
+
+        while node is not None:
+            if value <= node.value:
+                node = node.leftChild
+            else:
+                count += size(node.leftChild) + 1
+                node = node.rightChild
+
+        return count
+
+
+    # the number of values at most value
+    def __countAtMost(self, value):
+        count = 0
+        node = self.root
+
+        while node is not None:
+            if value < node.value:
+                node = node.leftChild
+            else:
+                count += size(node.leftChild) + 1
+                node = node.rightChild
+
+        return count
+
+
+    # the number of values v with lo <= v <= hi
+    def count_range(self, lo, hi):
+        self.__requireOrderStatistics()
+
+        if hi < lo:
+            return 0
+
+        return self.__countAtMost(hi) - self.rank(lo)
+
+
+    # the p-th percentile, for p from 0 to 100, by the nearest rank method:
+    # the smallest value with at least p percent of the values at or below it
+    def percentile(self, p):
+        self.__requireOrderStatistics()
+
+        if p < 0 or p > 100:
+            raise ValueError("The percentile must be between 0 and 100.")
+
+        numValues = size(self.root)
+        if numValues == 0:
+            raise IndexError("Percentile of an empty tree")
+
+        k = int(-(-p * numValues // 100))
+
+        return self.select(max(k - 1, 0))
         
 
-        if node.getRightChild() is not None:
-            return self.__min(node.getRightChild())
+    # the next node in order, found through the parent pointers. Walking a
+    # whole tree this way visits each edge twice, so a step is O(1) amortized
+    def _successor(self, node):
+
+        if node.rightChild is not None:
+            return self.__min(node.rightChild, True)
+
+        while node.parent is not None and node.parent.rightChild is node:
+            node = node.parent
+
+        return node.parent
+
+
+    # the previous node in order
+    def _predecessor(self, node):
+
+        if node.leftChild is not None:
+            return self.__max(node.leftChild, True)
+
+        while node.parent is not None and node.parent.leftChild is node:
+            node = node.parent
+
+        return node.parent
+
+
+    # the first node in order whose value is at least value, or greater than
+    # it with strict=True, or None if there is none
+    def __ceilingNode(self, value, strict=False):
+        candidate = None
+        node = self.root
+
+        while node is not None:
+            if node.value > value or (node.value == value and not strict):
+                candidate = node
+                node = node.leftChild
+            else:
+                node = node.rightChild
+
+        return candidate
+
+
+    # the last node in order whose value is at most value, or smaller than it
+    # with strict=True, or None if there is none
+    def __floorNode(self, value, strict=False):
+        candidate = None
+        node = self.root
+
+        while node is not None:
+            if node.value < value or (node.value == value and not strict):
+                candidate = node
+                node = node.rightChild
+            else:
+                node = node.leftChild
+
+        return candidate
+
+
+    # the largest value at most value, or None if every value is larger. The
+    # value itself does not have to be in the tree
+    def floor(self, value, returnNode=False):
+        node = self.__floorNode(value)
+
+        if returnNode or node is None:
+            return node
+
+        return node.value
+
+
+    # the smallest value at least value, or None if every value is smaller
+    def ceiling(self, value, returnNode=False):
+        node = self.__ceilingNode(value)
+
+        if returnNode or node is None:
+            return node
+
+        return node.value
+
+
+    # lazily yields the values from lo to hi in order, or the nodes with
+    # nodes=True. Either bound may be None for no bound. inclusive is a bool
+    # for both bounds or a (lo, hi) pair. The walk seeks lo once and then
+    # follows successors, so k values cost O(h + k). The tree must not be
+    # modified while the generator is suspended
+    def range(self, lo=None, hi=None, inclusive=True, nodes=False):
+
+        if isinstance(inclusive, tuple):
+            includeLo, includeHi = inclusive
         else:
-            return __getOneLarger(node)
-    
+            includeLo = includeHi = inclusive
 
-    # implements the recursion for getting the next smaller element
-    def __getOneSmaller(self, node):
-        
-        if node.isRoot():
-            return None
-        elif node.isRightChild():
-            return node.parent.value
+        if lo is None:
+            node = None if self.root is None else self.__min(self.root, True)
         else:
-            return self.__getOneSmaller(node.parent)
+            node = self.__ceilingNode(lo, strict=not includeLo)
+
+        while node is not None:
+            if hi is not None and (node.value > hi or (node.value == hi and not includeHi)):
+                return
+
+            yield node if nodes else node.value
+            node = self._successor(node)
+
+
+    # get the next larger value in the tree, or None if value is the largest.
+    # Raises if value is not in the tree
+    def getOneLarger(self, value):
 
-    # gets the next smallest element in the tree
+        if self.getNode(value) is None:
+            raise Exception("Value not in tree.")
+
+        node = self.__ceilingNode(value, strict=True)
+
+        return None if node is None else node.value
+    
+
+    # gets the next smaller value in the tree, or None if value is the
+    # smallest. Raises if value is not in the tree
     def getOneSmaller(self, value):
         
-        node = self.get(value)
-
-        if node is None:
+        if self.getNode(value) is None:
             raise Exception("Value not in tree")
-        
-        if node.getLeftChild() is not None:
-            return self.__max(node.getLeftChild())
-        else:
-            return self.__getOneSmaller(node)
 
+        node = self.__floorNode(value, strict=True)
 
-    
-    # public remove method provides user-friendly interface
+        return None if node is None else node.value
+
+
+    # public remove method provides user-friendly interface. A node with two
+    # children takes the value of its predecessor, the largest value in its
+    # left subtree, and the predecessor's node is removed instead
     def delete(self, value):
         
-        node = self.get(value)
+        node = self.getNode(value)
 
         if node is None:
             raise Exception("Value not in tree.")
         
-        nodeVal = None
-
-        if node.isLeaf():
-            if node.isLeftChild():
-                node.parent.leftChild = None
-                node.parent = None
-            elif node.isRightChild():
-                node.parent.rightChild = None
-                node.parent = None
-            elif node is self.root:
-                self.root = None
-            else:
-                raise Exception("Oops! Something went wrong!")
-            
-            nodeVal = node.value
-        
-        elif node.getLeftChild() is None:
-            if node.isLeftChild():
-                node.parent.leftChild = node.getRightChild()
-                node.getRightChild().parent = node.parent
-                node.parent = None
-                node.rightChild = None
-            elif node.isRightChild():
-                node.parent.rightChild = node.getRightChild()
-                node.getRightChild().parent = node.parent
-                node.parent = None
-                node.rightChild = None
-            elif node is self.root:
-                self.root = node.getRightChild()
-                node.getRightChild().parent = None
-                node.rightChild = None
-            else:
-                raise Exception("Oops! Something went wrong!")
-            
-            nodeVal = node.value
-        
-        elif node.getRightChild() is None:
-            if node.isLeftChild():
-                node.parent.leftChild = node.getLeftChild()
-                node.getLeftChild().parent = node.parent
-                node.parent = None
-                node.leftChild = None
-            elif node.isRightChild():
-                node.parent.rightChild = node.getLeftChild()
-                node.getLeftChild().parent = node.parent
-                node.parent = None
-                node.leftChild = None
-            elif node is self.root:
-                self.root = node.getLeftChild()
-                node.getLeftChild().parent = None
-                node.leftChild = None
-            else:
-                raise Exception("Oops! Something went wrong!")
-            
-            nodeVal = node.value
-        
-        else:
-            nodeToReplace = self.__max(node.getLeftChild(), True)
-            nodeVal = node.value
-            node.value = nodeToReplace.value
-            
-            if nodeToReplace.isLeftChild():
-                if nodeToReplace.isLeaf():
-                    nodeToReplace.parent.leftChild = None
-                    nodeToReplace.parent = None
-                else:
-                    nodeToReplace.parent.leftChild = nodeToReplace.getLeftChild()
-                    nodeToReplace.getLeftChild().parent = nodeToReplace.parent
-                    nodeToReplace.leftChild = None
-                    nodeToReplace.parent = None
-            
-            else:
-                if nodeToReplace.isLeaf():
-                    nodeToReplace.parent.rightChild = None
-                    nodeToReplace.parent = None
-                else:
-                    nodeToReplace.parent.rightChild = nodeToReplace.getLeftChild()
-                    nodeToReplace.getLeftChild().parent = nodeToReplace.parent
-                    nodeToReplace.parent = None
-                    nodeToReplace.leftChild = None
-            
+        nodeVal = node.value
 
-        if not self.__checkRep(self.root):
-            raise Exception("Rep invariant violated.")
+        if node.leftChild is not None and node.rightChild is not None:
+            nodeToReplace = self.__max(node.leftChild, True)
+            self._copyContents(nodeToReplace, node)
+            node = nodeToReplace
+
+        # the node now has at most one child, which takes its place
+        child = node.leftChild if node.leftChild is not None else node.rightChild
+        parent = node.parent
+        self._replaceChild(node, child)
+
+        node.parent = None
+        node.leftChild = None
+        node.rightChild = None
+
+        self._rebalance(parent)
+        self._afterOperation()
 
         return nodeVal
     
 
-    def __traverseInOrder(self, node, nodeFunction):
+    # in-order generator of the values, or of the nodes with nodes=True. The
+    # walk keeps a stack of at most h nodes. For O(1) memory, see traverse
+    # with morris=True
+    def iter_inorder(self, nodes=False):
+        walk = self.__iterInOrder()
 
-        if node.isLeaf():
-            nodeFunction(node)
-        elif node.getLeftChild() is None:
-            nodeFunction(node)
-            self.__traverseInOrder(node.getRightChild(), nodeFunction)
-        elif node.getRightChild() is None:
-            self.__traverseInOrder(node.getLeftChild(), nodeFunction)
-            nodeFunction(node)
-        else:
-            self.__traverseInOrder(node.getLeftChild(), nodeFunction)
-            nodeFunction(node)
-            self.__traverseInOrder(node.getRightChild(), nodeFunction)
+        if nodes:
+            return walk
 
+        return (node.value for node in walk)
 
-    def __traversePreOrder(self, node, nodeFunction):
 
-        if node.isLeaf():
-            nodeFunction(node)
-        elif node.getLeftChild() is None:
-            nodeFunction(node)
-            self.__traversePreOrder(node.getRightChild(), nodeFunction)
-        elif node.getRightChild() is None:
-            nodeFunction(node)
-            self.__traversePreOrder(node.getLeftChild(), nodeFunction)
-        else:
-            nodeFunction(node)
-            self.__traversePreOrder(node.getLeftChild(), nodeFunction)
-            self.__traversePreOrder(node.getRightChild(), nodeFunction)
-        
-    
-    def __traversePostOrder(self, node, nodeFunction):
+    def __iterInOrder(self):
+        stack = []
+        node = self.root
 
-        if node.isLeaf():
-            nodeFunction(node)
-        elif node.getLeftChild() is None:
-            self.__traversePostOrder(node.getRightChild(), nodeFunction)
-            nodeFunction(node)
-        elif node.getRightChild() is None:
-            self.__traversePostOrder(node.getLeftChild(), nodeFunction)
-            nodeFunction(node)
-        else:
-            self.__traversePostOrder(node.getLeftChild(), nodeFunction)
-            self.__traversePostOrder(node.getRightChild(), nodeFunction)
-            nodeFunction(node)
+        while node is not None or len(stack) > 0:
+            while node is not None:
+                stack.append(node)
+                node = node.leftChild
 
+            node = stack.pop()
+            yield node
+            node = node.rightChild
 
-    def traverse(self, nodeFunction=print, traverseOrder='inorder'):
 
-        if traverseOrder == 'inorder':
-            self.__traverseInOrder(self.root, nodeFunction)
+    # Morris in-order walk in O(1) memory. It temporarily threads the right
+    # pointers of predecessors back to their successors, and any other walk
+    # or search over a threaded tree can loop forever. So it is not a
+    # generator that could be left suspended: it runs to completion, and the
+    # threads are removed even if nodeFunction raises. nodeFunction must not
+    # read or modify the tree
+    def __traverseMorris(self, nodeFunction):
+        node = self.root
 
-        elif traverseOrder == 'preorder':
-            self.__traversePreOrder(self.root, nodeFunction)
+        try:
+            while node is not None:
+                current = node
+                node, visit = self.__morrisStep(node)
 
-        elif traverseOrder == 'postorder':
-            self.__traversePostOrder(self.root, nodeFunction)
-        
-        else:
-            raise Exception("Not a valid order of traversal. Options are: inorder, preorder, and postorder.")
+                if visit:
+                    nodeFunction(current)
 
-        
-        
-def buildBST(list):
-    builtTree = BinarySearchTree()
+        # finishes the walk without visiting, which removes every thread
+        finally:
+            while node is not None:
+                node = self.__morrisStep(node)[0]
 
-    for element in list:
-        builtTree.insert(element)
-    
-    return builtTree
 
+    # one step of the Morris walk from node. Returns the next node to step
+    # from, and whether node is visited in this step. A node with a left
+    # subtree is stepped from twice: first its predecessor is threaded to it
+    # and the walk goes left, then the thread is followed back, removed, and
+    # the node is visited
+    def __morrisStep(self, node):
 
-def BSTSort(list):
+        if node.leftChild is None:
+            return (node.rightChild, True)
 
-    def insertElems(node):
-        sortedList.append(node.value)
-    
-    myTree = BinarySearchTree()
-    sortedList = []
+        predecessor = node.leftChild
+        while predecessor.rightChild is not None and predecessor.rightChild is not node:
+            predecessor = predecessor.rightChild
 
-    for element in list:
-        myTree.insert(element)
-    
+        if predecessor.rightChild is None:
+            predecessor.rightChild = node
+            return (node.leftChild, False)
+
+        predecessor.rightChild = None
+        return (node.rightChild, True)
+
+
+    # pre-order generator of the values, or of the nodes with nodes=True
+    def iter_preorder(self, nodes=False):
+        walk = self.__iterPreOrder()
+
+        if nodes:
+            return walk
+
+        return (node.value for node in walk)
+
+
+    def __iterPreOrder(self):
+        stack = [] if self.root is None else [self.root]
+
+        while len(stack) > 0:
+            node = stack.pop()
+            yield node
 
-    myTree.traverse(insertElems, 'inorder')
+            if node.rightChild is not None:
+                stack.append(node.rightChild)
+            if node.leftChild is not None:
+                stack.append(node.leftChild)
 
-    return sortedList
 
+    # post-order generator of the values, or of the nodes with nodes=True
+    def iter_postorder(self, nodes=False):
+        walk = self.__iterPostOrder()
+
+        if nodes:
+            return walk
+
+        return (node.value for node in walk)
+
+
+    # a node is visited once its right subtree is done, which is when the
+    # previously visited node is its right child, or it has none
+    def __iterPostOrder(self):
+        stack = []
+        node = self.root
+        previous = None
+
+        while node is not None or len(stack) > 0:
+            while node is not None:
+                stack.append(node)
+                node = node.leftChild
+
+            top = stack[-1]
+
+            if top.rightChild is not None and top.rightChild is not previous:
+                node = top.rightChild
+            else:
+                previous = stack.pop()
+                yield previous
+
+
+    # iterating over the tree gives its values in order
+    def __iter__(self):
+        return self.iter_inorder()
+
+
+    # calls nodeFunction on every node in the given order. An empty tree has
+    # no nodes to call it on. An in-order traversal with morris=True uses
+    # O(1) memory, but nodeFunction must not use the tree
+    def traverse(self, nodeFunction=print, traverseOrder='inorder', morris=False):
+
+        if morris:
+            if traverseOrder != 'inorder':
+                raise Exception("Morris traversal is only available in order.")
+
+            self.__traverseMorris(nodeFunction)
+            return
+
+        if traverseOrder == 'inorder':
+            walk = self.iter_inorder(nodes=True)
+
+        elif traverseOrder == 'preorder':
+            walk = self.iter_preorder(nodes=True)
+
+        elif traverseOrder == 'postorder':
+            walk = self.iter_postorder(nodes=True)
+        
+        else:
+            raise Exception("Not a valid order of traversal. Options are: inorder, preorder, and postorder.")
+
+        for node in walk:
+            nodeFunction(node)
+
+        
+        
+'''
+Node of an AVL tree, which also records the height of its subtree. A leaf has
+height 1.
+'''
+class AVLNode(Node):
+
+    __slots__ = ('height',)
+
+    def __init__(self, value=None, parent=None, leftChild=None, rightChild=None):
+        super().__init__(value, parent, leftChild, rightChild)
+        self.height = 1
+
+
+def height(node):
+    return 0 if node is None else node.height
+
+
+# AVL node for trees with order statistics
+class SizedAVLNode(AVLNode):
+
+    __slots__ = ('size',)
+
+    def __init__(self, value=None, parent=None, leftChild=None, rightChild=None):
+        super().__init__(value, parent, leftChild, rightChild)
+        self.size = 1
+
+
+
+
+'''
+AVL tree: a binary search tree where the heights of the two subtrees of every
+node differ by at most one, so the height stays below 1.45*log2(n) whatever
+the order of the input. insert and delete walk back up from the change,
+updating heights and rotating where a node is out of balance, and stop
+rebalancing as soon as a subtree's height is unchanged. Rotations keep the
+subtree sizes of a tree with order statistics. The API is that of
+BinarySearchTree.
+'''
+class AVLTree(BinarySearchTree):
+
+    nodeType = AVLNode
+    sizedNodeType = SizedAVLNode
+
+
+    def _updateNode(self, node):
+        node.height = 1 + max(height(node.leftChild), height(node.rightChild))
+        super()._updateNode(node)
+
+
+    # rotations keep the parent pointers, and return the node that took the
+    # rotated node's place
+    def __rotateLeft(self, node):
+        pivot = node.rightChild
+
+        node.rightChild = pivot.leftChild
+        if pivot.leftChild is not None:
+            pivot.leftChild.parent = node
+
+        self._replaceChild(node, pivot)
+        pivot.leftChild = node
+        node.parent = pivot
+
+        self._updateNode(node)
+        self._updateNode(pivot)
+
+        return pivot
+
+
+    def __rotateRight(self, node):
+        pivot = node.leftChild
+
+        node.leftChild = pivot.rightChild
+        if pivot.rightChild is not None:
+            pivot.rightChild.parent = node
+
+        self._replaceChild(node, pivot)
+        pivot.rightChild = node
+        node.parent = pivot
+
+        self._updateNode(node)
+        self._updateNode(pivot)
+
+        return pivot
+
+
+    def _rebalance(self, node):
+
+        while node is not None:
+            oldHeight = node.height
+            self._updateNode(node)
+            balance = height(node.leftChild) - height(node.rightChild)
+
+            if balance > 1:
+                if height(node.leftChild.leftChild) < height(node.leftChild.rightChild):
+                    self.__rotateLeft(node.leftChild)
+                node = self.__rotateRight(node)
+
+            elif balance < -1:
+                if height(node.rightChild.rightChild) < height(node.rightChild.leftChild):
+                    self.__rotateRight(node.rightChild)
+                node = self.__rotateLeft(node)
+
+            # the subtree is as high as before, so nothing above it needs
+            # rebalancing, though the sizes above it still change
+            if node.height == oldHeight:
+                self._updateSizes(node.parent)
+                return
+
+            node = node.parent
+
+
+    # checks the AVL balance and heights on top of the binary search tree
+    # invariant
+    def isBalanced(self):
+        stack = [] if self.root is None else [self.root]
+
+        while len(stack) > 0:
+            node = stack.pop()
+
+            if node.height != 1 + max(height(node.leftChild), height(node.rightChild)):
+                return False
+            if abs(height(node.leftChild) - height(node.rightChild)) > 1:
+                return False
+
+            for child in (node.leftChild, node.rightChild):
+                if child is not None:
+                    stack.append(child)
+
+        return True
+
+        
+        
+'''
+Node of a SortedMap. value holds the sort key the tree is ordered by, key the
+key the caller used, payload the value stored under it, and count how many
+times the key has been inserted.
+'''
+class MapNode(AVLNode):
+
+    __slots__ = ('key', 'payload', 'count')
+
+    def __init__(self, value=None, parent=None, leftChild=None, rightChild=None):
+        super().__init__(value, parent, leftChild, rightChild)
+        self.key = value
+        self.payload = None
+        self.count = 1
+
+
+# map node for maps with order statistics
+class SizedMapNode(SizedAVLNode):
+
+    __slots__ = ('key', 'payload', 'count')
+
+    def __init__(self, value=None, parent=None, leftChild=None, rightChild=None):
+        super().__init__(value, parent, leftChild, rightChild)
+        self.key = value
+        self.payload = None
+        self.count = 1
+
+
+# marks a missing default argument, so that None can be a default
+MISSING = object()
+
+
+
+
+'''
+Sorted dictionary on an AVL tree, with one node per distinct key holding the
+key, its payload and a count. Keys are ordered by key(k) when a key function
+is given, so records can be ordered by one of their fields without wrapping
+them; keys with equal sort keys are the same entry. m[k] = v sets the
+payload, insert(k) and delete(k) add and remove one occurrence of k by
+updating its count, and pop(k) removes the entry whatever its count. items(),
+keys() and values() are views in key order.
+
+The methods inherited from BinarySearchTree, such as getNode, min, floor,
+range and select, take and return sort keys, and with orderStatistics=True the sizes
+count distinct keys.
+'''
+class SortedMap(AVLTree):
+
+    nodeType = MapNode
+    sizedNodeType = SizedMapNode
+
+
+    # items is an optional iterable of (key, payload) pairs
+    def __init__(self, items=None, key=None, **kwargs):
+        super().__init__(**kwargs)
+        self.key = key
+        self.numKeys = 0
+
+        if items is not None:
+            for mapKey, payload in items:
+                self[mapKey] = payload
+
+
+    # builds a map from (key, payload) pairs in O(n log n) by sorting them and
+    # bulk loading the tree. The last payload given for a key wins
+    @classmethod
+    def from_iterable(cls, items, **kwargs):
+        keyFunction = kwargs.get('key')
+        entries = []
+
+        for mapKey, payload in items:
+            entries.append((mapKey if keyFunction is None else keyFunction(mapKey), mapKey, payload))
+
+        # a stable sort on the sort keys alone, so keys and payloads are never
+        # compared, and the last of each run of equal sort keys is kept
+        entries.sort(key=lambda entry: entry[0])
+        entries = [entries[i] for i in range(len(entries)) if i + 1 == len(entries) or entries[i + 1][0] != entries[i][0]]
+
+        sortMap = super().from_sorted([entry[0] for entry in entries], **kwargs)
+
+        for node, entry in zip(sortMap.iter_inorder(nodes=True), entries):
+            node.key = entry[1]
+            node.payload = entry[2]
+
+        sortMap.numKeys = len(entries)
+
+        return sortMap
+
+
+    # pairs already in key order are loaded the same way, as sorting them
+    # again is linear
+    @classmethod
+    def from_sorted(cls, items, **kwargs):
+        return cls.from_iterable(items, **kwargs)
+
+
+    def __sortKey(self, mapKey):
+        return mapKey if self.key is None else self.key(mapKey)
+
+
+    # finds the node of a key, adding one with a count of 0 if there is none,
+    # in a single walk down the tree
+    def __findOrAdd(self, mapKey):
+        sortKey = self.__sortKey(mapKey)
+        parent = None
+        node = self.root
+
+        while node is not None:
+            if sortKey == node.value:
+                return node
+
+            parent = node
+            node = node.leftChild if sortKey < node.value else node.rightChild
+
+        node = self.nodeType(sortKey, parent)
+        node.key = mapKey
+        node.count = 0
+
+        if parent is None:
+            self.root = node
+        elif sortKey < parent.value:
+            parent.leftChild = node
+        else:
+            parent.rightChild = node
+
+        self.numKeys += 1
+        self._rebalance(parent)
+        self._afterOperation()
+
+        return node
+
+
+    def _copyContents(self, source, target):
+        target.value = source.value
+        target.key = source.key
+        target.payload = source.payload
+        target.count = source.count
+
+
+    def __len__(self):
+        return self.numKeys
+
+
+    def __contains__(self, mapKey):
+        return self.getNode(self.__sortKey(mapKey)) is not None
+
+
+    # returns the payload of a key, or default if the key is missing. The
+    # node of a sort key is found with getNode
+    def get(self, mapKey, default=None):
+        node = self.getNode(self.__sortKey(mapKey))
+        return default if node is None else node.payload
+
+
+    def __getitem__(self, mapKey):
+        node = self.getNode(self.__sortKey(mapKey))
+
+        if node is None:
+            raise KeyError(mapKey)
+
+        return node.payload
+
+
+    # sets the payload of a key. A new key starts with a count of 1, and the
+    # count of an existing key is left as it is
+    def __setitem__(self, mapKey, payload):
+        node = self.__findOrAdd(mapKey)
+        node.payload = payload
+
+        if node.count == 0:
+            node.count = 1
+
+
+    def __delitem__(self, mapKey):
+        self.pop(mapKey)
+
+
+    # removes a key whatever its count and returns its payload, or default if
+    # the key is missing and a default is given
+    def pop(self, mapKey, default=MISSING):
+        sortKey = self.__sortKey(mapKey)
+        node = self.getNode(sortKey)
+
+        if node is None:
+            if default is MISSING:
+                raise KeyError(mapKey)
+            return default
+
+        payload = node.payload
+        super().delete(sortKey)
+        self.numKeys -= 1
+
+        return payload
+
+
+    # adds one occurrence of a key
+    def insert(self, mapKey):
+        self.__findOrAdd(mapKey).count += 1
+
+
+    # removes one occurrence of a key, and the key itself when its count
+    # reaches 0
+    def delete(self, mapKey):
+        node = self.getNode(self.__sortKey(mapKey))
+
+        if node is None:
+            raise Exception("Value not in tree.")
+
+        node.count -= 1
+        if node.count == 0:
+            self.pop(mapKey)
+
+        return mapKey
+
+
+    # how many times a key is in the map, 0 if it is missing
+    def count(self, mapKey):
+        node = self.getNode(self.__sortKey(mapKey))
+        return 0 if node is None else node.count
+
+
+    def __iter__(self):
+        return iter(self.keys())
+
+
+    def items(self):
+        return MapView(self, ITEMS_VIEW)
+
+    def keys(self):
+        return MapView(self, KEYS_VIEW)
+
+    def values(self):
+        return MapView(self, VALUES_VIEW)
+
+
+
+
+# the kinds of view that MapView can present
+ITEMS_VIEW = 0
+KEYS_VIEW = 1
+VALUES_VIEW = 2
+
+
+'''
+Lazy view over the keys, payloads or (key, payload) pairs of a SortedMap, in
+key order. Iterating it walks the tree, and reversed walks it backwards.
+'''
+class MapView:
+
+
+    def __init__(self, sortMap, kind):
+        self.sortMap = sortMap
+        self.kind = kind
+
+
+    def __len__(self):
+        return len(self.sortMap)
+
+
+    def __view(self, nodes):
+        if self.kind == ITEMS_VIEW:
+            return ((node.key, node.payload) for node in nodes)
+        elif self.kind == KEYS_VIEW:
+            return (node.key for node in nodes)
+        else:
+            return (node.payload for node in nodes)
+
+
+    def __iter__(self):
+        return self.__view(self.sortMap.iter_inorder(nodes=True))
+
+
+    def __reversed__(self):
+        return self.__view(self.__iterBackwards())
+
+
+    def __iterBackwards(self):
+        node = self.sortMap.max(returnNode=True)
+
+        while node is not None:
+            yield node
+            node = self.sortMap._predecessor(node)
+
+        
+        
+# builds a balanced tree holding the values of the list
+def buildBST(list):
+    return BinarySearchTree.from_iterable(list)
+
+
+# tree sort through an AVL tree, which stays O(n log n) on any input order
+def BSTSort(list):
+    myTree = AVLTree()
+
+    for element in list:
+        myTree.insert(element)
+
+    return [value for value in myTree]
+
+
+
+
+# index used by NodePool for a missing child or parent
+NO_NODE = -1
+
+
+'''
+Struct-of-arrays storage for tree nodes. A node is an integer index, and its
+value, children and parent live in parallel columns. The links are kept in
+arrays of machine integers, so a node costs a few words instead of a whole
+object. Freed indices are reused by later allocations.
+'''
+class NodePool:
+
+
+    def __init__(self):
+        self.values = []
+        self.left = array('q')
+        self.right = array('q')
+        self.parent = array('q')
+        self.free = []
+    
+
+    def allocate(self, value, parent=NO_NODE):
+
+        if len(self.free) > 0:
+            index = self.free.pop()
+            self.values[index] = value
+            self.left[index] = NO_NODE
+            self.right[index] = NO_NODE
+            self.parent[index] = parent
+        else:
+            index = len(self.values)
+            self.values.append(value)
+            self.left.append(NO_NODE)
+            self.right.append(NO_NODE)
+            self.parent.append(parent)
+        
+        return index
+    
+
+    def release(self, index):
+        self.values[index] = None
+        self.free.append(index)
+
+
+
+
+'''
+Lightweight handle to a node in a NodePool. It offers the same read methods
+as Node, so code written against BinarySearchTree nodes also works on a
+PooledBinarySearchTree. Handles are created on demand and are not stored.
+'''
+class PoolNode:
+
+    __slots__ = ('pool', 'index')
+
+
+    def __init__(self, pool, index):
+        self.pool = pool
+        self.index = index
+    
+
+    def __str__(self):
+        return "Value: " + str(self.value)
+    
+
+    def __eq__(self, other):
+        return isinstance(other, PoolNode) and other.pool is self.pool and other.index == self.index
+    
+
+    def __hash__(self):
+        return hash(self.index)
+    
+
+    def __handle(self, index):
+        return None if index == NO_NODE else PoolNode(self.pool, index)
+
+
+    @property
+    def value(self):
+        return self.pool.values[self.index]
+    
+
+    @property
+    def parent(self):
+        return self.__handle(self.pool.parent[self.index])
+    
+
+    def getLeftChild(self):
+        return self.__handle(self.pool.left[self.index])
+    
+    def getRightChild(self):
+        return self.__handle(self.pool.right[self.index])
+    
+
+    def isRoot(self):
+        return self.pool.parent[self.index] == NO_NODE
+    
+    def isLeaf(self):
+        return self.pool.left[self.index] == NO_NODE and self.pool.right[self.index] == NO_NODE
+    
+
+    def isLeftChild(self):
+        parent = self.pool.parent[self.index]
+        return parent != NO_NODE and self.pool.left[parent] == self.index
+    
+
+    def isRightChild(self):
+        parent = self.pool.parent[self.index]
+        return parent != NO_NODE and self.pool.right[parent] == self.index
+
+
+
+
+'''
+Binary search tree with the same interface as BinarySearchTree, but whose
+nodes are stored in a NodePool instead of as Node objects. Methods that
+return nodes return PoolNode handles. All of the walks are iterative, so deep
+trees do not run into the recursion limit.
+'''
+class PooledBinarySearchTree:
+
+
+    def __init__(self):
+        self.pool = NodePool()
+        self.root = NO_NODE
+    
+
+    # index of a node holding value, or NO_NODE
+    def __find(self, value):
+        values = self.pool.values
+        index = self.root
+
+        while index != NO_NODE and values[index] != value:
+            if value < values[index]:
+                index = self.pool.left[index]
+            else:
+                index = self.pool.right[index]
+        
+        return index
+    
+
+    def __handle(self, index):
+        return None if index == NO_NODE else PoolNode(self.pool, index)
+    
+
+    def __maxIndex(self, index):
+        while self.pool.right[index] != NO_NODE:
+            index = self.pool.right[index]
+        return index
+    
+
+    def __minIndex(self, index):
+        while self.pool.left[index] != NO_NODE:
+            index = self.pool.left[index]
+        return index
+    
+
+    # puts child in the place of index under index's parent
+    def __replace(self, index, child):
+        parent = self.pool.parent[index]
+
+        if child != NO_NODE:
+            self.pool.parent[child] = parent
+        
+        if parent == NO_NODE:
+            self.root = child
+        elif self.pool.left[parent] == index:
+            self.pool.left[parent] = child
+        else:
+            self.pool.right[parent] = child
+
+
+    # equal values go to the left, as in BinarySearchTree
+    def insert(self, value):
+        pool = self.pool
+
+        if self.root == NO_NODE:
+            self.root = pool.allocate(value)
+            return
+        
+        index = self.root
+        while True:
+            if value <= pool.values[index]:
+                if pool.left[index] == NO_NODE:
+                    pool.left[index] = pool.allocate(value, index)
+                    return
+                index = pool.left[index]
+            else:
+                if pool.right[index] == NO_NODE:
+                    pool.right[index] = pool.allocate(value, index)
+                    return
+                index = pool.right[index]
+    
+
+    def getNode(self, value):
+        return self.__handle(self.__find(value))
+
+
+    def get(self, value):
+        return self.getNode(value)
+    
+
+    def max(self, returnNode=False):
+        if self.root == NO_NODE:
+            return None
+        
+        index = self.__maxIndex(self.root)
+        return self.__handle(index) if returnNode else self.pool.values[index]
+    
+
+    def min(self, returnNode=False):
+        if self.root == NO_NODE:
+            return None
+        
+        index = self.__minIndex(self.root)
+        return self.__handle(index) if returnNode else self.pool.values[index]
+    
+
+    def getOneLarger(self, value):
+        index = self.__find(value)
+
+        if index == NO_NODE:
+            raise Exception("Value not in tree.")
+        
+        if self.pool.right[index] != NO_NODE:
+            return self.pool.values[self.__minIndex(self.pool.right[index])]
+        
+        # climb until coming up from a left child
+        parent = self.pool.parent[index]
+        while parent != NO_NODE and self.pool.right[parent] == index:
+            index = parent
+            parent = self.pool.parent[index]
+        
+        return None if parent == NO_NODE else self.pool.values[parent]
+    
+
+    def getOneSmaller(self, value):
+        index = self.__find(value)
+
+        if index == NO_NODE:
+            raise Exception("Value not in tree")
+        
+        if self.pool.left[index] != NO_NODE:
+            return self.pool.values[self.__maxIndex(self.pool.left[index])]
+        
+        # climb until coming up from a right child
+        parent = self.pool.parent[index]
+        while parent != NO_NODE and self.pool.left[parent] == index:
+            index = parent
+            parent = self.pool.parent[index]
+        
+        return None if parent == NO_NODE else self.pool.values[parent]
+
+
+    # a node with two children takes the value of the largest node in its
+    # left subtree, which is then spliced out instead, as in BinarySearchTree
+    def delete(self, value):
+        pool = self.pool
+        index = self.__find(value)
+
+        if index == NO_NODE:
+            raise Exception("Value not in tree.")
+        
+        nodeVal = pool.values[index]
+
+        if pool.left[index] == NO_NODE:
+            self.__replace(index, pool.right[index])
+        elif pool.right[index] == NO_NODE:
+            self.__replace(index, pool.left[index])
+        else:
+            replacement = self.__maxIndex(pool.left[index])
+            pool.values[index] = pool.values[replacement]
+            self.__replace(replacement, pool.left[replacement])
+            index = replacement
+        
+        pool.release(index)
+
+        return nodeVal
+    
+
+    # yields node indices in the given order using an explicit stack
+    def __walk(self, traverseOrder):
+        pool = self.pool
+
+        if traverseOrder == 'inorder':
+            stack = []
+            index = self.root
+
+            while len(stack) > 0 or index != NO_NODE:
+                if index != NO_NODE:
+                    stack.append(index)
+                    index = pool.left[index]
+                else:
+                    index = stack.pop()
+                    yield index
+                    index = pool.right[index]
+        
+        elif traverseOrder == 'preorder':
+            stack = [self.root] if self.root != NO_NODE else []
+
+            while len(stack) > 0:
+                index = stack.pop()
+                yield index
+
+                if pool.right[index] != NO_NODE:
+                    stack.append(pool.right[index])
+                if pool.left[index] != NO_NODE:
+                    stack.append(pool.left[index])
+        
+        elif traverseOrder == 'postorder':
+            stack = [self.root] if self.root != NO_NODE else []
+            output = []
+
+            while len(stack) > 0:
+                index = stack.pop()
+                output.append(index)
+
+                if pool.left[index] != NO_NODE:
+                    stack.append(pool.left[index])
+                if pool.right[index] != NO_NODE:
+                    stack.append(pool.right[index])
+            
+            while len(output) > 0:
+                yield output.pop()
+        
+        else:
+            raise Exception("Not a valid order of traversal. Options are: inorder, preorder, and postorder.")
+    
+
+    def traverse(self, nodeFunction=print, traverseOrder='inorder'):
+        for index in self.__walk(traverseOrder):
+            nodeFunction(PoolNode(self.pool, index))